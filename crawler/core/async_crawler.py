@@ -397,10 +397,8 @@ class AsyncCrawler:
                 # 处理srcset属性（可能包含多个URL）
                 if attr == 'srcset':
                     urls = self._parse_srcset(value)
-                    for url in urls:
-                        absolute_url = url_parser.to_absolute_url(url)
-                        if url_parser.is_image_url(absolute_url):
-                            image_urls.add(absolute_url)
+                    image_urls.update(url_parser.filter_image_urls(
+                        url_parser.to_absolute_url(url) for url in urls))
                 else:
                     # 处理单个URL
                     absolute_url = url_parser.to_absolute_url(value.strip())
@@ -433,10 +431,8 @@ class AsyncCrawler:
         bg_pattern = r'background-image\s*:\s*url\s*\(\s*["\']?([^"\')\s]+)["\']?\s*\)'
         matches = re.findall(bg_pattern, style_text, re.IGNORECASE)
 
-        for match in matches:
-            absolute_url = url_parser.to_absolute_url(match)
-            if url_parser.is_image_url(absolute_url):
-                image_urls.add(absolute_url)
+        image_urls.update(url_parser.filter_image_urls(
+            url_parser.to_absolute_url(match) for match in matches))
 
         return image_urls
 
@@ -700,6 +696,10 @@ class TaskScheduler:
         """
         self.max_concurrent_crawlers = max_concurrent_crawlers
         self.active_crawlers: Dict[str, AsyncCrawler] = {}
+        # 任务ID -> 执行爬取的独立 asyncio 任务（不是调用 schedule_crawl 的任务）
+        self.active_task_handles: Dict[str, asyncio.Task] = {}
+        # 被 wait_for_tasks 超时取消的任务ID
+        self._cancelled_task_ids: Set[str] = set()
         self.completed_tasks: List[Dict[str, Any]] = []
         self.semaphore = asyncio.Semaphore(max_concurrent_crawlers)
 
@@ -723,8 +723,24 @@ class TaskScheduler:
                 crawler = AsyncCrawler(config)
                 self.active_crawlers[task_id] = crawler
 
+                # 爬取在独立任务中执行，停止时只取消该任务，不影响调用方
+                crawl_task = asyncio.create_task(crawler.start_crawling(start_url))
+                self.active_task_handles[task_id] = crawl_task
+
                 # 执行爬取
-                result = await crawler.start_crawling(start_url)
+                try:
+                    result = await crawl_task
+                except asyncio.CancelledError:
+                    # 调用方自身被取消时继续向上传递
+                    if task_id not in self._cancelled_task_ids:
+                        raise
+                    logger.warning(f"任务超时未停止，已取消: {task_id}")
+                    return {
+                        'success': False,
+                        'task_id': task_id,
+                        'start_url': start_url,
+                        'error': '任务已取消'
+                    }
                 result['task_id'] = task_id
                 result['start_url'] = start_url
 
@@ -745,6 +761,8 @@ class TaskScheduler:
                 # 清理
                 if task_id in self.active_crawlers:
                     del self.active_crawlers[task_id]
+                self.active_task_handles.pop(task_id, None)
+                self._cancelled_task_ids.discard(task_id)
 
     async def schedule_multiple_crawls(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -779,3 +797,42 @@ class TaskScheduler:
         for crawler in self.active_crawlers.values():
             crawler.stop_crawling()
         logger.info("已发送停止信号给所有活跃任务")
+
+    async def astop_all_tasks(self, grace_period: float = 30.0):
+        """
+        停止所有活跃任务
+
+        发送停止信号后等待任务自行结束，超时的任务再取消，见 wait_for_tasks。
+
+        Args:
+            grace_period: 等待任务正常结束的秒数
+        """
+        self.stop_all_tasks()
+        await self.wait_for_tasks(grace_period)
+
+    async def wait_for_tasks(self, grace_period: float = 30.0):
+        """
+        等待已收到停止信号的任务结束
+
+        超过 grace_period 秒仍未结束的爬取任务被取消并并发等待；对应的
+        schedule_crawl 返回失败结果，调用方不会被取消。
+
+        Args:
+            grace_period: 等待任务正常结束的秒数
+        """
+        tasks = {
+            task_id: task for task_id, task in self.active_task_handles.items()
+            if not task.done()
+        }
+        if not tasks:
+            return
+
+        _, pending = await asyncio.wait(tasks.values(), timeout=grace_period)
+        for task_id, task in tasks.items():
+            if task in pending:
+                self._cancelled_task_ids.add(task_id)
+                task.cancel()
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        logger.info(f"活跃任务已停止: {len(tasks) - len(pending)} 个正常结束，{len(pending)} 个被取消")
@@ -5,22 +5,57 @@
 """
 
 import asyncio
+import io
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Optional, Callable, List
 from pathlib import Path
 import time
 from datetime import datetime, timezone
 
+from sqlalchemy import inspect
+
 from crawler.core.async_crawler import AsyncCrawler, TaskScheduler
 from crawler.core.spider import ImageSpider
 from crawler.core.downloader import ImageDownloader
 from database.enhanced_manager import EnhancedDatabaseManager
+from database.models.base import Base
+from database.models.category import CategoryModel
 from database.models.image import ImageModel
 from database.models.crawl_session import CrawlSessionModel
 from config.manager import ConfigManager
 
 logger = logging.getLogger(__name__)
 
+# 超过该数量的图片在PostgreSQL上通过临时表批量导入
+BULK_STAGING_THRESHOLD = 1000
+
+# 备用数据库必须具备的表
+REQUIRED_TABLES = ('images', 'categories', 'crawl_sessions', 'tags')
+
+
+@lru_cache(maxsize=128)
+def _normalize_extension(suffix: str) -> str:
+    """规范化扩展名，不合法时回退为.jpg（实际出现的扩展名种类很少，适合缓存）"""
+    if 1 < len(suffix) <= 6:
+        return suffix.lower()
+    return '.jpg'
+
+
+def _ext_of(name: str) -> str:
+    """从文件名或URL中提取扩展名，避免逐行构造Path对象"""
+    basename = name.rpartition('/')[2]
+    i = basename.rfind('.')
+    return _normalize_extension(basename[i:] if i > 0 else '')
+
+
+def _copy_escape(value: str) -> str:
+    """转义COPY文本格式中的特殊字符"""
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
 
 class ImageCrawler:
     """
@@ -67,10 +102,15 @@ class ImageCrawler:
         self.task_scheduler = TaskScheduler(
             max_concurrent_crawlers=self.settings.crawler.max_concurrent
         )
+        # stop_all_tasks 在事件循环内调度的停止任务
+        self._stop_task: Optional[asyncio.Task] = None
         
         # 当前会话
         self.current_session: Optional[CrawlSessionModel] = None
 
+        # 已确认表结构完整的备用数据库
+        self._schema_verified: set = set()
+
         # 启动容灾备份监控（如果启用）
         self._start_disaster_recovery()
 
@@ -96,20 +136,22 @@ class ImageCrawler:
         
         try:
             # 准备配置
+            crw = self.settings.crawler
+            ac = self.settings.anti_crawler
             crawler_config = {
-                'max_concurrent': self.settings.crawler.max_concurrent,
-                'max_depth': self.settings.crawler.max_depth,
-                'max_images': self.settings.crawler.max_images,
+                'max_concurrent': crw.max_concurrent,
+                'max_depth': crw.max_depth,
+                'max_images': crw.max_images,
                 'max_pages': 100,  # 可以从配置中获取
-                'download_path': self.settings.crawler.download_path,
+                'download_path': crw.download_path,
                 'anti_crawler': {
-                    'use_random_user_agent': self.settings.anti_crawler.use_random_user_agent,
-                    'default_headers': self.settings.anti_crawler.default_headers,
-                    'use_proxy': self.settings.anti_crawler.use_proxy,
-                    'proxy_list': self.settings.anti_crawler.proxy_list,
-                    'random_delay': self.settings.anti_crawler.random_delay,
-                    'min_delay': self.settings.anti_crawler.min_delay,
-                    'max_delay': self.settings.anti_crawler.max_delay,
+                    'use_random_user_agent': ac.use_random_user_agent,
+                    'default_headers': ac.default_headers,
+                    'use_proxy': ac.use_proxy,
+                    'proxy_list': ac.proxy_list,
+                    'random_delay': ac.random_delay,
+                    'min_delay': ac.min_delay,
+                    'max_delay': ac.max_delay,
                 }
             }
             
@@ -126,22 +168,11 @@ class ImageCrawler:
                 config=crawler_config
             )
             
-            # 保存结果到数据库（添加超时）
+            # 在同一个数据库会话中保存结果并标记会话完成（添加超时）
             try:
                 await asyncio.wait_for(
-                    self._save_crawl_results(session_id, result),
-                    timeout=60.0  # 60秒超时
-                )
-            except asyncio.TimeoutError:
-                logger.error(f"保存爬取结果超时: {session_id}")
-            except Exception as e:
-                logger.error(f"保存爬取结果失败: {session_id} -> {e}")
-
-            # 标记会话完成（添加超时）
-            try:
-                await asyncio.wait_for(
-                    self._complete_crawl_session(session_id, result),
-                    timeout=30.0  # 30秒超时
+                    self._finalize_crawl_session(session_id, result),
+                    timeout=90.0  # 90秒超时
                 )
             except asyncio.TimeoutError:
                 logger.error(f"完成爬取会话超时: {session_id}")
@@ -150,6 +181,11 @@ class ImageCrawler:
             
             return result
             
+        except asyncio.CancelledError:
+            # 任务被取消时会话不会走到完成或失败的流程，这里标记后继续向上传递取消
+            logger.warning(f"爬取任务已取消: {session_id}")
+            await self._fail_crawl_session(session_id, "任务已取消")
+            raise
         except Exception as e:
             logger.error(f"爬取过程中发生错误: {e}")
             await self._fail_crawl_session(session_id, str(e))
@@ -168,23 +204,26 @@ class ImageCrawler:
         Returns:
             爬取结果列表
         """
+        crw = self.settings.crawler
+        ac = self.settings.anti_crawler
+
         tasks = []
         for i, url in enumerate(urls):
             task_name = f"{session_name}_{i}" if session_name else f"batch_{i}"
             
             crawler_config = {
-                'max_concurrent': self.settings.crawler.max_concurrent,
-                'max_depth': self.settings.crawler.max_depth,
-                'max_images': self.settings.crawler.max_images,
-                'download_path': self.settings.crawler.download_path,
+                'max_concurrent': crw.max_concurrent,
+                'max_depth': crw.max_depth,
+                'max_images': crw.max_images,
+                'download_path': crw.download_path,
                 'anti_crawler': {
-                    'use_random_user_agent': self.settings.anti_crawler.use_random_user_agent,
-                    'default_headers': self.settings.anti_crawler.default_headers,
-                    'use_proxy': self.settings.anti_crawler.use_proxy,
-                    'proxy_list': self.settings.anti_crawler.proxy_list,
-                    'random_delay': self.settings.anti_crawler.random_delay,
-                    'min_delay': self.settings.anti_crawler.min_delay,
-                    'max_delay': self.settings.anti_crawler.max_delay,
+                    'use_random_user_agent': ac.use_random_user_agent,
+                    'default_headers': ac.default_headers,
+                    'use_proxy': ac.use_proxy,
+                    'proxy_list': ac.proxy_list,
+                    'random_delay': ac.random_delay,
+                    'min_delay': ac.min_delay,
+                    'max_delay': ac.max_delay,
                 }
             }
             
@@ -216,18 +255,30 @@ class ImageCrawler:
             
             db_session.add(crawl_session)
             db_session.commit()
+            # 提交后立即加载全部字段，使脱离会话的实例可在后续阶段直接复用
+            db_session.refresh(crawl_session)
             
             self.current_session = crawl_session
             logger.info(f"创建爬取会话: {crawl_session.id}")
             
             return crawl_session.id
+
+    def _attach_crawl_session(self, db_session, session_id: int) -> Optional[CrawlSessionModel]:
+        """
+        将爬取会话记录关联到给定数据库会话
+
+        若为当前会话，则以 merge(load=False) 复用创建时保留的实例，
+        不再发出SELECT；只有被修改的字段会在提交时写回。
+        """
+        current = self.current_session
+        if current is not None and current.id == session_id:
+            return db_session.merge(current, load=False)
+        return db_session.get(CrawlSessionModel, session_id)
     
     async def _update_session_progress(self, session_id: int, stats: Dict[str, Any]):
         """更新会话进度"""
         with self.db_manager.get_session() as db_session:
-            session = db_session.query(CrawlSessionModel).filter(
-                CrawlSessionModel.id == session_id
-            ).first()
+            session = self._attach_crawl_session(db_session, session_id)
             
             if session:
                 session.processed_pages = stats.get('pages_crawled', 0)
@@ -237,12 +288,31 @@ class ImageCrawler:
                 
                 db_session.commit()
     
-    async def _save_crawl_results(self, session_id: int, result: Dict[str, Any]):
-        """保存爬取结果到数据库"""
+    async def _finalize_crawl_session(self, session_id: int, result: Dict[str, Any]):
+        """
+        保存爬取结果并完成爬取会话
+
+        两个步骤共用一个数据库会话，只提交一次事务；
+        保存图片在保存点中执行，失败时不影响会话完成。
+        """
+        with self.db_manager.get_session() as db_session:
+            await self._save_crawl_results(session_id, result, db_session=db_session)
+            await self._complete_crawl_session(session_id, result, db_session=db_session)
+
+    async def _save_crawl_results(self, session_id: int, result: Dict[str, Any], db_session=None):
+        """
+        保存爬取结果到数据库
+
+        Args:
+            session_id: 会话ID
+            result: 爬取结果
+            db_session: 外部数据库会话（可选），提供时在保存点中写入，由调用方提交
+        """
         if not result.get('success', False):
             return
 
-        downloaded_images = result.get('downloaded_images', [])
+        # 按出现顺序去重，避免重复URL进入存在性查询和插入集合
+        downloaded_images = list(dict.fromkeys(result.get('downloaded_images', [])))
         if not downloaded_images:
             logger.info("没有下载的图片需要保存")
             return
@@ -250,89 +320,170 @@ class ImageCrawler:
         logger.info(f"开始保存 {len(downloaded_images)} 张图片信息到数据库...")
 
         try:
-            with self.db_manager.get_session() as db_session:
-                # 获取默认分类
-                from database.models.category import CategoryModel
-                default_category = db_session.query(CategoryModel).filter(
-                    CategoryModel.slug == "uncategorized"
-                ).first()
-
-                # 批量检查已存在的图片
-                existing_urls = set()
-                if downloaded_images:
-                    existing_images = db_session.query(ImageModel.url).filter(
-                        ImageModel.url.in_(downloaded_images)
-                    ).all()
-                    existing_urls = {img.url for img in existing_images}
-
-                # 获取URL到文件名的映射
-                url_to_filename = result.get('url_to_filename', {})
-
-                # 批量创建新图片记录
-                new_images = []
-                for image_url in downloaded_images:
-                    if image_url not in existing_urls:
-                        # 使用实际的文件名，如果没有映射则从URL提取
-                        actual_filename = url_to_filename.get(image_url)
-                        if actual_filename:
-                            filename = actual_filename
-                            file_extension = Path(actual_filename).suffix or '.jpg'
-                        else:
-                            # 回退到从URL提取（兼容旧版本）
-                            filename = Path(image_url).name
-                            file_extension = Path(image_url).suffix or '.jpg'
-
-                        image = ImageModel(
-                            url=image_url,
-                            source_url=result.get('start_url', ''),
-                            filename=filename,
-                            file_extension=file_extension,
-                            category_id=default_category.id if default_category else None,
-                            is_downloaded=True,
-                        )
-                        new_images.append(image)
-
-                # 批量添加到数据库
-                if new_images:
-                    db_session.add_all(new_images)
+            if db_session is None:
+                with self.db_manager.get_session() as db_session:
+                    saved_count = self._add_new_images(db_session, downloaded_images, result)
                     db_session.commit()
-                    logger.info(f"保存了 {len(new_images)} 张新图片信息到数据库")
-                else:
-                    logger.info("所有图片都已存在，无需保存")
+            else:
+                with db_session.begin_nested():
+                    saved_count = self._add_new_images(db_session, downloaded_images, result)
+
+            if saved_count:
+                logger.info(f"保存了 {saved_count} 张新图片信息到数据库")
+            else:
+                logger.info("所有图片都已存在，无需保存")
 
         except Exception as e:
             logger.error(f"保存图片信息到数据库失败: {e}")
             # 不抛出异常，避免影响会话完成
+
+    def _add_new_images(self, db_session, downloaded_images: List[str], result: Dict[str, Any]) -> int:
+        """将尚未入库的图片记录加入会话，返回新增数量"""
+        # 获取默认分类
+        default_category = db_session.query(CategoryModel).filter(
+            CategoryModel.slug == "uncategorized"
+        ).first()
+        category_id = default_category.id if default_category else None
+
+        # 大批量数据在PostgreSQL上走临时表 + 反连接插入
+        if (len(downloaded_images) > BULK_STAGING_THRESHOLD
+                and db_session.get_bind().dialect.name == 'postgresql'):
+            return self._bulk_insert_via_staging(
+                db_session, downloaded_images, result, category_id
+            )
+
+        # 构造记录期间禁止自动flush，避免查询触发对待插入对象的重复flush
+        with db_session.no_autoflush:
+            # 批量检查已存在的图片
+            existing_images = db_session.query(ImageModel.url).filter(
+                ImageModel.url.in_(downloaded_images)
+            ).all()
+            existing_urls = {img.url for img in existing_images}
+
+            # 获取URL到文件名的映射
+            url_to_filename = result.get('url_to_filename', {})
+
+            # 批量创建新图片记录
+            new_images = []
+            for image_url in downloaded_images:
+                if image_url not in existing_urls:
+                    # 使用实际的文件名，如果没有映射则从URL提取
+                    actual_filename = url_to_filename.get(image_url)
+                    if actual_filename:
+                        filename = actual_filename
+                    else:
+                        # 回退到从URL提取（兼容旧版本）
+                        filename = Path(image_url).name
+                    file_extension = _ext_of(actual_filename or image_url)
+
+                    image = ImageModel(
+                        url=image_url,
+                        source_url=result.get('start_url', ''),
+                        filename=filename,
+                        file_extension=file_extension,
+                        category_id=category_id,
+                        is_downloaded=True,
+                    )
+                    new_images.append(image)
+
+        # 批量添加到数据库
+        if new_images:
+            db_session.add_all(new_images)
+            db_session.flush()
+
+        return len(new_images)
+
+    def _bulk_insert_via_staging(self, db_session, downloaded_images: List[str],
+                                 result: Dict[str, Any], category_id: Optional[int]) -> int:
+        """
+        通过临时表批量导入图片记录（仅PostgreSQL）
+
+        先用COPY将URL及文件名写入事务级临时表，再用一条
+        INSERT ... SELECT ... LEFT JOIN 插入数据库中尚不存在的URL，
+        避免超长IN查询和逐行ORM对象构造。
+
+        Returns:
+            新插入的记录数
+        """
+        url_to_filename = result.get('url_to_filename', {})
+
+        # downloaded_images 已由调用方去重，满足临时表的URL主键约束
+        buffer = io.StringIO()
+        for image_url in downloaded_images:
+            actual_filename = url_to_filename.get(image_url)
+            filename = actual_filename or Path(image_url).name
+            file_extension = _ext_of(actual_filename or image_url)
+            buffer.write(f"{_copy_escape(image_url)}\t{_copy_escape(filename)}\t"
+                         f"{_copy_escape(file_extension)}\n")
+        buffer.seek(0)
+
+        cursor = db_session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS tmp_crawl_images ("
+                "url text PRIMARY KEY, filename text, file_extension text"
+                ") ON COMMIT DROP"
+            )
+            cursor.execute("TRUNCATE tmp_crawl_images")
+            cursor.copy_expert(
+                "COPY tmp_crawl_images (url, filename, file_extension) FROM STDIN",
+                buffer
+            )
+            cursor.execute(
+                "INSERT INTO images (url, source_url, filename, file_extension, category_id, "
+                "is_downloaded, has_transparency, download_attempts, is_duplicate, status) "
+                "SELECT tmp.url, %s, tmp.filename, tmp.file_extension, %s, "
+                "TRUE, FALSE, 0, FALSE, 'active' "
+                "FROM tmp_crawl_images tmp "
+                "LEFT JOIN images i ON i.url = tmp.url "
+                "WHERE i.url IS NULL",
+                (result.get('start_url', ''), category_id)
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
     
-    async def _complete_crawl_session(self, session_id: int, result: Dict[str, Any]):
-        """完成爬取会话"""
+    async def _complete_crawl_session(self, session_id: int, result: Dict[str, Any], db_session=None):
+        """
+        完成爬取会话
+
+        Args:
+            session_id: 会话ID
+            result: 爬取结果
+            db_session: 外部数据库会话（可选），提供时复用该会话并在此提交
+        """
         try:
             logger.info(f"正在完成爬取会话: {session_id}")
 
-            with self.db_manager.get_session() as db_session:
-                session = db_session.query(CrawlSessionModel).filter(
-                    CrawlSessionModel.id == session_id
-                ).first()
-
-                if session:
-                    session.mark_completed()
-                    session.summary_log = f"爬取完成: {result.get('summary', '')}"
-
-                    db_session.commit()
-                    logger.info(f"爬取会话完成: {session_id}")
-                else:
-                    logger.warning(f"未找到会话: {session_id}")
+            if db_session is None:
+                with self.db_manager.get_session() as db_session:
+                    self._mark_session_completed(db_session, session_id, result)
+            else:
+                self._mark_session_completed(db_session, session_id, result)
 
         except Exception as e:
             logger.error(f"完成爬取会话失败: {session_id} -> {e}")
             # 不抛出异常，避免影响整个爬取流程
+
+    def _mark_session_completed(self, db_session, session_id: int, result: Dict[str, Any]):
+        """在给定数据库会话中标记会话完成并提交"""
+        session = self._attach_crawl_session(db_session, session_id)
+
+        if session:
+            session.mark_completed()
+            session.summary_log = f"爬取完成: {result.get('summary', '')}"
+
+            db_session.commit()
+            logger.info(f"爬取会话完成: {session_id}")
+        else:
+            # 仍需提交，确保共享会话中已保存的图片落库
+            db_session.commit()
+            logger.warning(f"未找到会话: {session_id}")
     
     async def _fail_crawl_session(self, session_id: int, error_message: str):
         """标记爬取会话失败"""
         with self.db_manager.get_session() as db_session:
-            session = db_session.query(CrawlSessionModel).filter(
-                CrawlSessionModel.id == session_id
-            ).first()
+            session = self._attach_crawl_session(db_session, session_id)
             
             if session:
                 session.mark_failed(error_message)
@@ -408,7 +559,6 @@ class ImageCrawler:
             # 检查主数据库是否有数据
             try:
                 with backup_manager.get_session(primary_db) as session:
-                    from database.models.image import ImageModel
                     image_count = session.query(ImageModel).count()
 
                     if image_count == 0:
@@ -435,7 +585,6 @@ class ImageCrawler:
                         # 检查备用数据库是否已有数据
                         try:
                             with backup_manager.get_session(backup_db) as session:
-                                from database.models.image import ImageModel
                                 backup_image_count = session.query(ImageModel).count()
 
                                 if backup_image_count >= image_count:
@@ -485,36 +634,40 @@ class ImageCrawler:
                 logger.info(f"🔧 检查 {len(backup_dbs)} 个备用数据库的表结构...")
 
                 for backup_db in backup_dbs:
+                    # 已验证过的备用数据库无需重复检查（如重连后再次调用）
+                    if backup_db in self._schema_verified:
+                        continue
+
                     try:
                         engine = backup_manager.engines[backup_db]
 
                         # 检查表是否存在
-                        from sqlalchemy import inspect
-                        inspector = inspect(engine)
-                        tables = inspector.get_table_names()
-
-                        required_tables = ['images', 'categories', 'crawl_sessions', 'tags']
-                        missing_tables = [table for table in required_tables if table not in tables]
+                        tables = set(inspect(engine).get_table_names())
+                        missing_tables = [table for table in REQUIRED_TABLES if table not in tables]
 
                         if missing_tables:
                             logger.info(f"🔧 在 {backup_db} 中创建缺少的表: {missing_tables}")
 
-                            # 创建缺少的表
-                            from database.models.base import Base
-                            Base.metadata.create_all(bind=engine)
-
-                            # 验证表是否创建成功
-                            inspector = inspect(engine)
-                            tables = inspector.get_table_names()
-                            still_missing = [table for table in required_tables if table not in tables]
+                            # 只创建缺少的表
+                            Base.metadata.create_all(
+                                bind=engine,
+                                tables=[Base.metadata.tables[table] for table in missing_tables]
+                            )
+
+                            # 调试模式下验证表是否创建成功
+                            if logger.isEnabledFor(logging.DEBUG):
+                                tables = set(inspect(engine).get_table_names())
+                                still_missing = [table for table in REQUIRED_TABLES if table not in tables]
+                                if still_missing:
+                                    logger.error(f"❌ 在 {backup_db} 中创建表失败，仍缺少: {still_missing}")
+                                    continue
 
-                            if still_missing:
-                                logger.error(f"❌ 在 {backup_db} 中创建表失败，仍缺少: {still_missing}")
-                            else:
-                                logger.info(f"✅ 在 {backup_db} 中成功创建所有必要的表")
+                            logger.info(f"✅ 在 {backup_db} 中成功创建所有必要的表")
                         else:
                             logger.info(f"✅ {backup_db} 的表结构完整")
 
+                        self._schema_verified.add(backup_db)
+
                     except Exception as e:
                         logger.error(f"❌ 检查 {backup_db} 表结构失败: {e}")
 
@@ -552,6 +705,22 @@ class ImageCrawler:
             logger.error(f"获取容灾状态失败: {e}")
             return {"enabled": False, "error": str(e)}
 
+    async def astop_all_tasks(self):
+        """停止所有活跃任务，并发取消并等待任务结束"""
+        await self.task_scheduler.astop_all_tasks()
+
     def stop_all_tasks(self):
-        """停止所有活跃任务"""
+        """
+        停止所有活跃任务
+
+        立即向各爬虫发送停止信号；在运行中的事件循环内调用时，再调度
+        wait_for_tasks 取消超时未结束的爬取并返回对应的任务。
+        """
         self.task_scheduler.stop_all_tasks()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        # 保留任务引用，避免调用方丢弃返回值后任务被回收
+        self._stop_task = loop.create_task(self.task_scheduler.wait_for_tasks())
+        return self._stop_task
@@ -6,15 +6,71 @@
 
 import re
 import logging
-from typing import Dict, Any, List, Optional, Tuple
-from pathlib import Path
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 import hashlib
-from PIL import Image
-import numpy as np
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
 
 logger = logging.getLogger(__name__)
 
 
+# numpy 和 PIL 只在内容分析、近似重复检测时需要，延迟到首次使用时导入，
+# 仅做文件名/尺寸分类时不承担其导入开销
+@lru_cache(maxsize=None)
+def _numpy():
+    import numpy
+    return numpy
+
+
+@lru_cache(maxsize=None)
+def _pil_image():
+    from PIL import Image
+    return Image
+
+
+def _color_stats(pixels, tolerance):
+    """单次遍历 (H, W, 3) uint8 像素：返回 (是否灰度, R/G/B 通道和)"""
+    is_grayscale = True
+    sum_r = sum_g = sum_b = 0
+    for i in range(pixels.shape[0]):
+        for j in range(pixels.shape[1]):
+            r = int(pixels[i, j, 0])
+            g = int(pixels[i, j, 1])
+            b = int(pixels[i, j, 2])
+            sum_r += r
+            sum_g += g
+            sum_b += b
+            if is_grayscale and max(r, g, b) - min(r, g, b) > tolerance:
+                is_grayscale = False
+    return is_grayscale, sum_r, sum_g, sum_b
+
+
+@lru_cache(maxsize=None)
+def _color_kernel():
+    """numba 可用时返回 JIT 编译的 _color_stats，否则返回 None（使用 numpy 实现）"""
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True, nogil=True)(_color_stats)
+
+
+# 图片格式只有少数几种取值，缓存其小写形式
+_lower_format = lru_cache(maxsize=128)(str.lower)
+
+
+@lru_cache(maxsize=None)
+def _popcount_table():
+    """0-255 每个字节的置位数，用于向量化 popcount"""
+    np = _numpy()
+    return np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
 class ImageClassifier:
     """
     图片分类器
@@ -27,6 +83,37 @@ class ImageClassifier:
     - 重复检测
     """
     
+    # 参与分类计算的字段，组成分类结果缓存的键
+    _CACHE_KEY_FIELDS = (
+        'md5_hash', 'filename', 'url', 'width', 'height', 'format', 'file_size', 'local_path'
+    )
+    # 分类器实际读取的输入字段，全部为空时直接返回默认结果
+    _INPUT_FIELDS = _CACHE_KEY_FIELDS[1:]
+    
+    # 质量评估分档：升序阈值与各档得分（落在第 i 档取第 i 个得分）
+    _RESOLUTION_BINS = (640 * 480, 1280 * 720, 1920 * 1080)
+    _RESOLUTION_SCORES = (0.1, 0.2, 0.3, 0.4)
+    _FILE_SIZE_BINS = (100 * 1024, 500 * 1024)
+    _FILE_SIZE_SCORES = (0.0, 0.1, 0.2)
+    _FORMAT_SCORES = {'png': 0.2, 'jpg': 0.2, 'jpeg': 0.2, 'webp': 0.1, 'bmp': 0.1}
+    
+    # 标签与统计用的尺寸阈值
+    _HD_WIDTH = 1920
+    _HD_HEIGHT = 1080
+    _SMALL_EDGE = 300
+    _SIZE_DISTRIBUTION_BINS = (640 * 480, 1920 * 1080)
+    _QUALITY_DISTRIBUTION_BINS = (0.4, 0.7)
+    
+    # RGB 通道对应的主导颜色名称
+    _COLOR_NAMES = ('red', 'green', 'blue')
+    
+    # 灰度判定允许的通道最大差值（容忍JPEG压缩噪声）
+    _GRAYSCALE_TOLERANCE = 2
+    
+    # 内容分析的 JPEG 缩小解码尺寸和颜色统计用的缩略图尺寸（保持宽高比）
+    _CONTENT_DRAFT_SIZE = (128, 128)
+    _CONTENT_THUMBNAIL_SIZE = (64, 64)
+    
     def __init__(self, config: Dict[str, Any]):
         """
         初始化分类器
@@ -39,22 +126,132 @@ class ImageClassifier:
         self.size_rules = config.get('size_rules', {})
         self.enable_content_classification = config.get('enable_content_classification', False)
         
-        # 编译文件名规则
+        # 分类结果缓存（FIFO淘汰）
+        self._classify_cache: Dict[tuple, Dict[str, Any]] = {}
+        self._classify_cache_size = config.get('classification_cache_size', 4096)
+        
+        # 编译文件名规则：每个分类的关键词合并为一个交替正则
         self.compiled_filename_rules = {}
         for category, keywords in self.filename_rules.items():
-            patterns = [re.compile(rf'\b{keyword}\b', re.IGNORECASE) for keyword in keywords]
-            self.compiled_filename_rules[category] = patterns
+            if not keywords:
+                continue
+            alternation = '|'.join(re.escape(keyword) for keyword in keywords)
+            pattern = re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+            self.compiled_filename_rules[category] = (pattern, len(keywords))
+        
+        # 尺寸规则预先展开为 (分类, 最小宽, 最大宽, 最小高, 最大高)，分类时不再逐条 dict.get
+        self._size_rule_bounds = [
+            (category,
+             rules.get('min_width', 0), rules.get('max_width', float('inf')),
+             rules.get('min_height', 0), rules.get('max_height', float('inf')))
+            for category, rules in self.size_rules.items()
+        ]
+        self._size_rule_arrays = None
+        
+        # 所有输入字段为空时的分类结果（只依赖配置），预先计算一次
+        self._empty_result = self._classify_image_uncached({})
     
     def classify_image(self, image_info: Dict[str, Any]) -> Dict[str, Any]:
         """
         对图片进行分类
         
+        相同输入的分类结果会被缓存，重复分类（如统计时）直接返回缓存副本。
+        
         Args:
             image_info: 图片信息字典
             
         Returns:
             分类结果
         """
+        if not self._has_classification_input(image_info):
+            return self._copy_result(self._empty_result)
+        
+        key = tuple(image_info.get(field) for field in self._CACHE_KEY_FIELDS)
+        try:
+            cached = self._classify_cache.get(key)
+        except TypeError:
+            # 字段值不可哈希时不使用缓存
+            return self._classify_image_uncached(image_info)
+        
+        if cached is not None:
+            return self._copy_result(cached)
+        
+        return self._store_result(key, self._classify_image_uncached(image_info))
+    
+    def classify_images_batch(self, image_infos: List[Dict[str, Any]], batch_size: int = 64) -> List[Dict[str, Any]]:
+        """
+        批量分类图片
+        
+        每批图片的尺寸分类通过一次广播比较完成；启用内容分类时，每张图片生成与
+        classify_image 相同的64像素缩略图，缩略图尺寸相同的图片堆叠后一次完成
+        颜色分析，结果与逐张分类一致。结果顺序与输入一致。
+        
+        Args:
+            image_infos: 图片信息列表
+            batch_size: 每批解码的图片数量
+            
+        Returns:
+            分类结果列表
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(image_infos)
+        pending = []
+        for index, image_info in enumerate(image_infos):
+            if not self._has_classification_input(image_info):
+                results[index] = self._copy_result(self._empty_result)
+                continue
+            key = tuple(image_info.get(field) for field in self._CACHE_KEY_FIELDS)
+            try:
+                cached = self._classify_cache.get(key)
+            except TypeError:
+                results[index] = self._classify_image_uncached(image_info)
+                continue
+            if cached is not None:
+                results[index] = self._copy_result(cached)
+            else:
+                pending.append((index, key, image_info))
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            batch_infos = [image_info for _, _, image_info in batch]
+            size_results = self._classify_size_results_batch(batch_infos)
+            if self.enable_content_classification:
+                content_results = self._classify_content_batch(batch_infos)
+            else:
+                content_results = [None] * len(batch)
+            for (index, key, image_info), size_result, content_result in zip(batch, size_results, content_results):
+                result = self._classify_image_uncached(image_info, content_result, size_result)
+                results[index] = self._store_result(key, result)
+        
+        return results
+    
+    def clear_classification_cache(self):
+        """清空分类结果缓存"""
+        self._classify_cache.clear()
+    
+    @classmethod
+    def _has_classification_input(cls, image_info: Dict[str, Any]) -> bool:
+        """是否存在任一可用于分类的字段（新发现、尚未下载的URL条目通常全部为空）"""
+        return any(image_info.get(field) for field in cls._INPUT_FIELDS)
+    
+    @staticmethod
+    def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """复制分类结果，避免调用方修改缓存中的列表"""
+        return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+    
+    def _store_result(self, key: tuple, result: Dict[str, Any]) -> Dict[str, Any]:
+        """写入分类结果缓存并返回副本，失败的结果不缓存"""
+        if 'error' not in result and self._classify_cache_size > 0:
+            if len(self._classify_cache) >= self._classify_cache_size:
+                self._classify_cache.pop(next(iter(self._classify_cache)))
+            self._classify_cache[key] = result
+            return self._copy_result(result)
+        
+        return result
+    
+    def _classify_image_uncached(self, image_info: Dict[str, Any],
+                                 content_result: Optional[Dict[str, Any]] = None,
+                                 size_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """执行实际的分类计算，content_result/size_result 为批量预先计算的分类结果"""
         result = {
             'categories': [],
             'primary_category': None,
@@ -73,7 +270,8 @@ class ImageClassifier:
                 result['confidence'] = max(result['confidence'], filename_result['confidence'])
             
             # 基于尺寸分类
-            size_result = self._classify_by_size(image_info)
+            if size_result is None:
+                size_result = self._classify_by_size(image_info)
             if size_result['category']:
                 result['categories'].append(size_result['category'])
                 result['classification_method'].append('size')
@@ -81,7 +279,8 @@ class ImageClassifier:
             
             # 基于内容分类（如果启用）
             if self.enable_content_classification and image_info.get('local_path'):
-                content_result = self._classify_by_content(image_info)
+                if content_result is None:
+                    content_result = self._classify_by_content(image_info)
                 if content_result['category']:
                     result['categories'].append(content_result['category'])
                     result['classification_method'].append('content')
@@ -110,23 +309,19 @@ class ImageClassifier:
     
     def _classify_by_filename(self, image_info: Dict[str, Any]) -> Dict[str, Any]:
         """基于文件名分类"""
-        filename = image_info.get('filename', '')
-        url = image_info.get('url', '')
-        
-        # 检查文件名和URL
-        text_to_check = f"{filename} {url}".lower()
+        # 检查文件名和URL：规则已忽略大小写，无需先生成整段小写副本，
+        # 只对命中的关键词做小写归一
+        texts_to_check = (str(image_info.get('filename', '')), str(image_info.get('url', '')))
         
         best_category = None
         best_confidence = 0.0
         
-        for category, patterns in self.compiled_filename_rules.items():
-            matches = 0
-            for pattern in patterns:
-                if pattern.search(text_to_check):
-                    matches += 1
+        for category, (pattern, keyword_count) in self.compiled_filename_rules.items():
+            # 统计命中的不同关键词数量
+            matches = len({m.group(0).lower() for text in texts_to_check for m in pattern.finditer(text)})
             
             if matches > 0:
-                confidence = min(matches / len(patterns), 1.0)
+                confidence = min(matches / keyword_count, 1.0)
                 if confidence > best_confidence:
                     best_category = category
                     best_confidence = confidence
@@ -144,12 +339,7 @@ class ImageClassifier:
         if not width or not height:
             return {'category': None, 'confidence': 0.0}
         
-        for category, rules in self.size_rules.items():
-            min_width = rules.get('min_width', 0)
-            max_width = rules.get('max_width', float('inf'))
-            min_height = rules.get('min_height', 0)
-            max_height = rules.get('max_height', float('inf'))
-            
+        for category, min_width, max_width, min_height, max_height in self._size_rule_bounds:
             if (min_width <= width <= max_width and 
                 min_height <= height <= max_height):
                 return {
@@ -159,60 +349,175 @@ class ImageClassifier:
         
         return {'category': None, 'confidence': 0.0}
     
+    def _classify_by_size_batch(self, widths: 'np.ndarray', heights: 'np.ndarray') -> 'np.ndarray':
+        """
+        批量尺寸分类：所有图片 × 所有规则一次广播比较
+        
+        Returns:
+            每张图片命中的第一条规则下标，未命中或缺少尺寸为 -1
+        """
+        np = _numpy()
+        if self._size_rule_arrays is None:
+            bounds = np.array([rule[1:] for rule in self._size_rule_bounds], dtype=np.float64).reshape(-1, 4)
+            self._size_rule_arrays = tuple(bounds[:, column] for column in range(4))
+        min_width, max_width, min_height, max_height = self._size_rule_arrays
+        
+        widths = np.asarray(widths, dtype=np.float64)[:, None]
+        heights = np.asarray(heights, dtype=np.float64)[:, None]
+        mask = ((min_width <= widths) & (widths <= max_width)
+                & (min_height <= heights) & (heights <= max_height)
+                & (widths != 0) & (heights != 0))
+        
+        matched = mask.any(axis=1)
+        return np.where(matched, mask.argmax(axis=1) if mask.shape[1] else 0, -1)
+    
+    def _classify_size_results_batch(self, image_infos: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """将批量尺寸分类结果展开为与 _classify_by_size 相同的结果字典"""
+        np = _numpy()
+        try:
+            widths = np.fromiter((image_info.get('width') or 0 for image_info in image_infos), dtype=np.float64)
+            heights = np.fromiter((image_info.get('height') or 0 for image_info in image_infos), dtype=np.float64)
+        except (TypeError, ValueError):
+            # 尺寸字段不是数值时回退到逐张分类
+            return [None] * len(image_infos)
+        
+        results = []
+        for rule_index in self._classify_by_size_batch(widths, heights).tolist():
+            if rule_index < 0:
+                results.append({'category': None, 'confidence': 0.0})
+            else:
+                results.append({'category': self._size_rule_bounds[rule_index][0], 'confidence': 0.8})
+        return results
+    
     def _classify_by_content(self, image_info: Dict[str, Any]) -> Dict[str, Any]:
         """基于内容分类（简单实现）"""
         # 这里可以集成机器学习模型进行内容分类
         # 目前提供一个基础的实现
         
         local_path = image_info.get('local_path')
-        if not local_path or not Path(local_path).exists():
+        if not local_path:
             return {'category': None, 'confidence': 0.0}
         
+        # 直接打开文件，不再先做一次 exists() 检查
         try:
-            with Image.open(local_path) as img:
+            with _pil_image().open(local_path) as img:
+                # JPEG 直接按缩小比例解码（1/2~1/8），避免全尺寸 IDCT
+                img.draft('RGB', self._CONTENT_DRAFT_SIZE)
                 # 基于颜色特征的简单分类
-                colors = self._analyze_colors(img)
-                
-                # 基于颜色判断可能的类别
-                if colors['is_grayscale']:
-                    return {'category': '黑白图片', 'confidence': 0.7}
-                elif colors['dominant_color'] == 'blue':
-                    return {'category': '蓝色主题', 'confidence': 0.6}
-                elif colors['dominant_color'] == 'green':
-                    return {'category': '绿色主题', 'confidence': 0.6}
+                return self._category_from_colors(self._analyze_colors(img))
                 
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.warning(f"内容分析失败: {e}")
         
         return {'category': None, 'confidence': 0.0}
     
-    def _analyze_colors(self, img: Image.Image) -> Dict[str, Any]:
-        """分析图片颜色特征"""
-        # 转换为RGB模式
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+    @staticmethod
+    def _category_from_colors(colors: Dict[str, Any]) -> Dict[str, Any]:
+        """基于颜色特征判断可能的类别"""
+        if colors['is_grayscale']:
+            return {'category': '黑白图片', 'confidence': 0.7}
+        elif colors['dominant_color'] == 'blue':
+            return {'category': '蓝色主题', 'confidence': 0.6}
+        elif colors['dominant_color'] == 'green':
+            return {'category': '绿色主题', 'confidence': 0.6}
         
-        # 缩小图片以提高处理速度
-        img.thumbnail((100, 100))
+        return {'category': None, 'confidence': 0.0}
+    
+    def _classify_content_batch(self, image_infos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量内容分类
+
+        与逐张分类使用相同的缩略图，保证两条路径结果一致；缩略图尺寸相同的
+        图片堆叠为一个数组，一次完成颜色归约。
+        """
+        np = _numpy()
+        Image = _pil_image()
+        empty = {'category': None, 'confidence': 0.0}
+        results = [dict(empty) for _ in image_infos]
+        
+        # 缩略图尺寸 -> [(图片下标, 像素数组)]
+        groups: Dict[tuple, List[tuple]] = {}
+        for index, image_info in enumerate(image_infos):
+            local_path = image_info.get('local_path')
+            if not local_path:
+                continue
+            try:
+                with Image.open(local_path) as img:
+                    img.draft('RGB', self._CONTENT_DRAFT_SIZE)
+                    pixels = self._content_pixels(img)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"内容分析失败: {e}")
+                continue
+            groups.setdefault(pixels.shape, []).append((index, pixels))
+        
+        for shape, items in groups.items():
+            pixels = np.stack([item_pixels for _, item_pixels in items])
+            channel_spread = pixels.max(axis=3) - pixels.min(axis=3)
+            is_grayscale = channel_spread.max(axis=(1, 2)) <= self._GRAYSCALE_TOLERANCE
+            pixel_count = max(shape[0] * shape[1], 1)
+            avg_colors = pixels.reshape(len(items), -1, 3).sum(axis=1, dtype=np.uint32) / pixel_count
+            dominant = avg_colors.argmax(axis=1)
+            # 最大通道不唯一时主导颜色为 unknown，与逐张分析保持一致
+            unique_max = (avg_colors == avg_colors.max(axis=1, keepdims=True)).sum(axis=1) == 1
+            
+            for row, (index, _) in enumerate(items):
+                colors = {
+                    'is_grayscale': bool(is_grayscale[row]),
+                    'avg_color': avg_colors[row].tolist(),
+                    'dominant_color': self._COLOR_NAMES[dominant[row]] if unique_max[row] else 'unknown',
+                }
+                results[index] = self._category_from_colors(colors)
         
-        # 转换为numpy数组
-        img_array = np.array(img)
+        return results
+    
+    def _content_pixels(self, img: 'Image.Image') -> 'np.ndarray':
+        """缩小为保持宽高比的RGB缩略图并转换为uint8数组，逐张和批量内容分析共用"""
+        np = _numpy()
         
-        # 检查是否为灰度图
-        r, g, b = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2]
-        is_grayscale = np.allclose(r, g) and np.allclose(g, b)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.thumbnail(self._CONTENT_THUMBNAIL_SIZE)
         
-        # 计算平均颜色
-        avg_color = np.mean(img_array, axis=(0, 1))
+        # 转换为uint8数组（不复制数据）
+        return np.asarray(img, dtype=np.uint8)
+    
+    def _analyze_colors(self, img: 'Image.Image') -> Dict[str, Any]:
+        """分析图片颜色特征"""
+        np = _numpy()
         
-        # 确定主导颜色
-        dominant_color = 'unknown'
-        if avg_color[0] > avg_color[1] and avg_color[0] > avg_color[2]:
-            dominant_color = 'red'
-        elif avg_color[1] > avg_color[0] and avg_color[1] > avg_color[2]:
-            dominant_color = 'green'
-        elif avg_color[2] > avg_color[0] and avg_color[2] > avg_color[1]:
-            dominant_color = 'blue'
+        # 缩小图片以提高处理速度
+        img_array = self._content_pixels(img)
+        
+        kernel = _color_kernel()
+        if kernel is not None:
+            # numba 内核：灰度判断与通道求和合并为一次遍历
+            is_grayscale, sum_r, sum_g, sum_b = kernel(img_array, self._GRAYSCALE_TOLERANCE)
+            pixel_count = max(img_array.shape[0] * img_array.shape[1], 1)
+            avg_color = np.array((sum_r, sum_g, sum_b), dtype=np.float64) / pixel_count
+        else:
+            # 检查是否为灰度图：按32行分块比较通道极差，遇到彩色块提前结束
+            is_grayscale = True
+            for y in range(0, img_array.shape[0], 32):
+                tile = img_array[y:y + 32]
+                if (tile.max(axis=2) - tile.min(axis=2)).max() > self._GRAYSCALE_TOLERANCE:
+                    is_grayscale = False
+                    break
+            
+            # 计算平均颜色：uint32 累加后再做一次除法，避免 mean 转换为 float64 数组
+            pixels = img_array.reshape(-1, 3)
+            avg_color = pixels.sum(axis=0, dtype=np.uint32) / max(len(pixels), 1)
+        is_grayscale = bool(is_grayscale)
+        
+        # 确定主导颜色：最大通道不唯一（如灰度图）时为 unknown
+        dominant = int(np.argmax(avg_color))
+        if np.count_nonzero(avg_color == avg_color[dominant]) == 1:
+            dominant_color = self._COLOR_NAMES[dominant]
+        else:
+            dominant_color = 'unknown'
         
         return {
             'is_grayscale': is_grayscale,
@@ -229,16 +534,8 @@ class ImageClassifier:
         height = image_info.get('height', 0)
         
         if width and height:
-            # 分辨率评分
-            resolution = width * height
-            if resolution >= 1920 * 1080:  # 高清
-                score += 0.4
-            elif resolution >= 1280 * 720:  # 标清
-                score += 0.3
-            elif resolution >= 640 * 480:   # 低清
-                score += 0.2
-            else:
-                score += 0.1
+            # 分辨率评分：高清 / 标清 / 低清 / 其他
+            score += self._RESOLUTION_SCORES[bisect_right(self._RESOLUTION_BINS, width * height)]
             
             # 宽高比评分
             aspect_ratio = width / height
@@ -250,17 +547,11 @@ class ImageClassifier:
         # 基于文件大小评分
         file_size = image_info.get('file_size', 0)
         if file_size:
-            if file_size >= 500 * 1024:  # 大于500KB
-                score += 0.2
-            elif file_size >= 100 * 1024:  # 大于100KB
-                score += 0.1
+            # 大于500KB / 大于100KB
+            score += self._FILE_SIZE_SCORES[bisect_right(self._FILE_SIZE_BINS, file_size)]
         
         # 基于格式评分
-        format_name = image_info.get('format', '').lower()
-        if format_name in ['png', 'jpg', 'jpeg']:
-            score += 0.2
-        elif format_name in ['webp', 'bmp']:
-            score += 0.1
+        score += self._FORMAT_SCORES.get(_lower_format(image_info.get('format', '')), 0.0)
         
         return min(score, 1.0)
     
@@ -277,9 +568,9 @@ class ImageClassifier:
         height = image_info.get('height', 0)
         
         if width and height:
-            if width >= 1920 and height >= 1080:
+            if width >= self._HD_WIDTH and height >= self._HD_HEIGHT:
                 tags.append('高清')
-            elif width <= 300 or height <= 300:
+            elif width <= self._SMALL_EDGE or height <= self._SMALL_EDGE:
                 tags.append('小图')
             
             # 方向标签
@@ -291,7 +582,7 @@ class ImageClassifier:
                 tags.append('方图')
         
         # 基于格式添加标签
-        format_name = image_info.get('format', '').lower()
+        format_name = image_info.get('format', '')
         if format_name:
             tags.append(format_name.upper())
         
@@ -302,67 +593,133 @@ class ImageClassifier:
         elif quality_score <= 0.3:
             tags.append('低质量')
         
-        return list(set(tags))  # 去重
+        return list(dict.fromkeys(tags))  # 保序去重
     
     def detect_duplicates(self, image_list: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """检测重复图片"""
-        duplicates = {}
-        hash_groups = {}
-        
+        # 基于MD5哈希检测完全重复，单次遍历分组
+        hash_groups = defaultdict(list)
         for image_info in image_list:
-            # 基于MD5哈希检测完全重复
             md5_hash = image_info.get('md5_hash')
             if md5_hash:
-                if md5_hash not in hash_groups:
-                    hash_groups[md5_hash] = []
                 hash_groups[md5_hash].append(image_info)
         
-        # 找出重复组
-        for hash_value, images in hash_groups.items():
-            if len(images) > 1:
-                duplicates[hash_value] = images
+        # 只保留重复组
+        return {hash_value: images for hash_value, images in hash_groups.items() if len(images) > 1}
+    
+    def detect_near_duplicates(self, image_list: List[Dict[str, Any]],
+                               max_distance: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        基于差异哈希（dHash）检测近似重复图片
+        
+        能识别缩放、重新压缩后的同一张图片。以每组第一张图片的哈希为代表，
+        汉明距离不超过 max_distance 的图片归为一组。
+        
+        Args:
+            image_list: 图片信息列表（需包含 local_path）
+            max_distance: 允许的最大汉明距离（0-64）
+            
+        Returns:
+            {代表哈希(十六进制): 图片列表}，只包含重复组
+        """
+        candidates = []
+        hashes = []
+        for image_info in image_list:
+            local_path = image_info.get('local_path')
+            if not local_path:
+                continue
+            dhash = self._dhash(local_path)
+            if dhash is not None:
+                candidates.append(image_info)
+                hashes.append(dhash)
+        
+        if len(hashes) < 2:
+            return {}
+        
+        np = _numpy()
+        hash_array = np.array(hashes, dtype=np.uint64)
+        count = len(hash_array)
+        assigned = np.zeros(count, dtype=bool)
+        duplicates = {}
+        
+        # 分块计算汉明距离矩阵，避免 N×N 一次性占用过多内存
+        block_size = 256
+        for start in range(0, count, block_size):
+            distances = self._hamming_distances(hash_array[start:start + block_size], hash_array)
+            for offset, row in enumerate(distances):
+                index = start + offset
+                if assigned[index]:
+                    continue
+                members = np.flatnonzero((row <= max_distance) & ~assigned)
+                if len(members) > 1:
+                    assigned[members] = True
+                    duplicates[f'{int(hash_array[index]):016x}'] = [candidates[i] for i in members]
         
         return duplicates
     
+    @staticmethod
+    def _dhash(local_path: str) -> Optional[int]:
+        """计算图片的64位差异哈希，失败返回 None"""
+        np = _numpy()
+        Image = _pil_image()
+        try:
+            with Image.open(local_path) as img:
+                img.draft('L', (36, 32))
+                small = img.convert('L').resize((9, 8), Image.BILINEAR)
+                pixels = np.asarray(small, dtype=np.int16)
+        except Exception as e:
+            logger.debug(f"计算dHash失败 {local_path}: {e}")
+            return None
+        
+        bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+        return int(np.packbits(bits).view('>u8')[0])
+    
+    @staticmethod
+    def _hamming_distances(rows: 'np.ndarray', hashes: 'np.ndarray') -> 'np.ndarray':
+        """计算 rows 中每个哈希与 hashes 中所有哈希的汉明距离矩阵"""
+        np = _numpy()
+        xor = np.bitwise_xor.outer(rows, hashes)
+        return _popcount_table()[xor.view(np.uint8)].reshape(xor.shape + (8,)).sum(axis=-1)
+    
     def get_classification_statistics(self, images: List[Dict[str, Any]]) -> Dict[str, Any]:
         """获取分类统计信息"""
-        stats = {
-            'total_images': len(images),
-            'categories': {},
-            'quality_distribution': {'high': 0, 'medium': 0, 'low': 0},
-            'format_distribution': {},
-            'size_distribution': {'large': 0, 'medium': 0, 'small': 0},
-        }
+        np = _numpy()
+        count = len(images)
+        
+        # 分类统计：走批量分类，尺寸规则一次广播比较，已分类的图片直接命中缓存
+        classifications = self.classify_images_batch(images)
+        categories = Counter(classification['primary_category'] for classification in classifications)
+        
+        # 质量统计：一次分档 low / medium / high
+        quality_scores = np.fromiter((c['quality_score'] for c in classifications), dtype=np.float64, count=count)
+        quality_tiers = np.bincount(
+            np.searchsorted(self._QUALITY_DISTRIBUTION_BINS, quality_scores, side='right'), minlength=3)
+        
+        # 格式统计
+        formats = Counter(image_info.get('format', 'unknown') for image_info in images)
+        
+        # 尺寸统计：只统计有宽高的图片，一次分档 small / medium / large
+        dimensions = np.array(
+            [(image_info.get('width') or 0, image_info.get('height') or 0) for image_info in images],
+            dtype=np.int64).reshape(count, 2)
+        widths, heights = dimensions[:, 0], dimensions[:, 1]
+        has_size = (widths != 0) & (heights != 0)
+        size_tiers = np.bincount(
+            np.searchsorted(self._SIZE_DISTRIBUTION_BINS, widths[has_size] * heights[has_size], side='right'),
+            minlength=3)
         
-        for image_info in images:
-            # 分类统计
-            classification = self.classify_image(image_info)
-            category = classification['primary_category']
-            stats['categories'][category] = stats['categories'].get(category, 0) + 1
-            
-            # 质量统计
-            quality_score = classification['quality_score']
-            if quality_score >= 0.7:
-                stats['quality_distribution']['high'] += 1
-            elif quality_score >= 0.4:
-                stats['quality_distribution']['medium'] += 1
-            else:
-                stats['quality_distribution']['low'] += 1
-            
-            # 格式统计
-            format_name = image_info.get('format', 'unknown')
-            stats['format_distribution'][format_name] = stats['format_distribution'].get(format_name, 0) + 1
-            
-            # 尺寸统计
-            width = image_info.get('width', 0)
-            height = image_info.get('height', 0)
-            if width and height:
-                resolution = width * height
-                if resolution >= 1920 * 1080:
-                    stats['size_distribution']['large'] += 1
-                elif resolution >= 640 * 480:
-                    stats['size_distribution']['medium'] += 1
-                else:
-                    stats['size_distribution']['small'] += 1
-        
-        return stats
+        return {
+            'total_images': count,
+            'categories': dict(categories),
+            'quality_distribution': {
+                'high': int(quality_tiers[2]),
+                'medium': int(quality_tiers[1]),
+                'low': int(quality_tiers[0]),
+            },
+            'format_distribution': dict(formats),
+            'size_distribution': {
+                'large': int(size_tiers[2]),
+                'medium': int(size_tiers[1]),
+                'small': int(size_tiers[0]),
+            },
+        }
@@ -4,14 +4,35 @@
 提供统一的日志记录和管理功能
 """
 
+import asyncio
+import itertools
 import logging
+import random
 import sys
+import time
+from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Optional, Dict, Any
 from loguru import logger
 import json
 from datetime import datetime
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from sqlalchemy.exc import SQLAlchemyError
+except ImportError:
+    SQLAlchemyError = None
+
+# 错误分类用的异常类型元组，模块加载时构建一次；可选依赖缺失时对应类型不参与匹配
+_CLIENT_ERRORS = (aiohttp.ClientError,) if aiohttp is not None else ()
+_TIMEOUT_ERRORS = (asyncio.TimeoutError,)
+_NETWORK_ERRORS = _CLIENT_ERRORS + _TIMEOUT_ERRORS + (ConnectionError,)
+_DATABASE_ERRORS = (SQLAlchemyError,) if SQLAlchemyError is not None else ()
+
 
 class LoggerManager:
     """
@@ -39,6 +60,8 @@ class LoggerManager:
         self.backup_count = config.get('backup_count', 5)
         self.console_output = config.get('console_output', True)
         self.verbose = config.get('verbose', False)
+        # 文件处理器是否通过后台线程异步写入；短时运行的命令可关闭以省去队列线程的启动和回收
+        self.async_io = config.get('async_io', True)
         self.format_string = config.get('format', 
             "{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}")
         
@@ -53,6 +76,9 @@ class LoggerManager:
         log_path = Path(self.log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
+        # backtrace/diagnose 会遍历调用栈并格式化变量，只在详细模式下开启
+        diagnose = bool(self.verbose)
+        
         # 添加文件处理器
         logger.add(
             self.log_file,
@@ -62,9 +88,9 @@ class LoggerManager:
             retention=self.backup_count,
             compression="zip",
             encoding="utf-8",
-            enqueue=True,  # 异步写入
-            backtrace=True,
-            diagnose=True
+            enqueue=self.async_io,  # 异步写入
+            backtrace=diagnose,
+            diagnose=diagnose
         )
         
         # 添加控制台处理器
@@ -81,8 +107,9 @@ class LoggerManager:
                 level=self.log_level,
                 format=console_format,
                 colorize=True,
-                backtrace=True,
-                diagnose=True
+                enqueue=False,  # 控制台输出同步写入，避免额外的队列拷贝
+                backtrace=diagnose,
+                diagnose=diagnose
             )
         
         # 添加错误文件处理器
@@ -95,7 +122,7 @@ class LoggerManager:
             retention=self.backup_count,
             compression="zip",
             encoding="utf-8",
-            enqueue=True
+            enqueue=self.async_io
         )
         
         # 设置第三方库日志级别
@@ -192,6 +219,9 @@ class ErrorHandler:
             'total_errors': 0,
         }
         self.retry_counts = {}
+        # 错误占比缓存，仅在有新错误后的首次查询时重新计算
+        self._cached_rates: Dict[str, float] = {}
+        self._needs_rate_refresh = True
     
     def handle_error(self, error: Exception, context: Dict[str, Any] = None, 
                     operation: str = None) -> Dict[str, Any]:
@@ -209,6 +239,7 @@ class ErrorHandler:
         error_type = self._classify_error(error)
         self.error_stats[error_type] += 1
         self.error_stats['total_errors'] += 1
+        self._needs_rate_refresh = True
         
         error_info = {
             'error_type': error_type,
@@ -231,28 +262,21 @@ class ErrorHandler:
     
     def _classify_error(self, error: Exception) -> str:
         """分类错误类型"""
-        import aiohttp
-        import asyncio
-        from sqlalchemy.exc import SQLAlchemyError
-        
-        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)):
+        if isinstance(error, _NETWORK_ERRORS):
             return 'network_errors'
         elif isinstance(error, (ValueError, TypeError, AttributeError)):
             return 'parsing_errors'
         elif isinstance(error, (FileNotFoundError, PermissionError, OSError)):
             return 'file_errors'
-        elif isinstance(error, SQLAlchemyError):
+        elif isinstance(error, _DATABASE_ERRORS):
             return 'database_errors'
         else:
             return 'unknown_errors'
     
     def _should_retry(self, error: Exception, context: Dict[str, Any] = None) -> bool:
         """判断是否应该重试"""
-        import aiohttp
-        import asyncio
-        
         # 网络相关错误通常可以重试
-        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)):
+        if isinstance(error, _NETWORK_ERRORS):
             return True
         
         # 临时文件错误可以重试
@@ -271,24 +295,18 @@ class ErrorHandler:
         delay = min(2 ** retry_count, 60)
         
         # 网络错误使用较短延迟
-        import aiohttp
-        import asyncio
-        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+        if isinstance(error, _CLIENT_ERRORS + _TIMEOUT_ERRORS):
             delay = min(delay, 10)
         
         return delay
     
     def _get_recovery_action(self, error: Exception, context: Dict[str, Any] = None) -> str:
         """获取恢复操作建议"""
-        import aiohttp
-        import asyncio
-        from sqlalchemy.exc import SQLAlchemyError
-        
-        if isinstance(error, asyncio.TimeoutError):
+        if isinstance(error, _TIMEOUT_ERRORS):
             return "增加超时时间或检查网络连接"
-        elif isinstance(error, aiohttp.ClientError):
+        elif isinstance(error, _CLIENT_ERRORS):
             return "检查目标网站状态或更换代理"
-        elif isinstance(error, SQLAlchemyError):
+        elif isinstance(error, _DATABASE_ERRORS):
             return "检查数据库连接或重启数据库服务"
         elif isinstance(error, FileNotFoundError):
             return "检查文件路径或创建必要的目录"
@@ -307,17 +325,33 @@ class ErrorHandler:
     
     def get_error_statistics(self) -> Dict[str, Any]:
         """获取错误统计信息"""
-        return {
-            **self.error_stats,
-            'retry_counts': dict(self.retry_counts),
-            'error_rate': {
-                error_type: count / max(self.error_stats['total_errors'], 1) * 100
+        if self._needs_rate_refresh:
+            total = max(self.error_stats['total_errors'], 1)
+            self._cached_rates = {
+                error_type: count / total * 100
                 for error_type, count in self.error_stats.items()
                 if error_type != 'total_errors'
             }
+            self._needs_rate_refresh = False
+        
+        return {
+            **self.error_stats,
+            'retry_counts': dict(self.retry_counts),
+            'error_rate': dict(self._cached_rates)
         }
 
 
+class _Span:
+    """进行中的操作计时记录"""
+    
+    __slots__ = ('operation', 'start_time', 'start_ns')
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.start_time = time.time()
+        self.start_ns = time.perf_counter_ns()
+
+
 class PerformanceMonitor:
     """
     性能监控器
@@ -329,67 +363,88 @@ class PerformanceMonitor:
     - 性能报告生成
     """
     
-    def __init__(self, logger_manager: LoggerManager):
+    def __init__(self, logger_manager: LoggerManager, min_log_duration: float = 0.01,
+                 sample_rate: float = 0.0):
         """
         初始化性能监控器
         
         Args:
             logger_manager: 日志管理器
+            min_log_duration: 耗时达到该值（秒）的操作才逐条记录日志
+            sample_rate: 低于阈值的快速操作被抽样记录的概率（0-1）
         """
         self.logger = logger_manager.get_logger("PerformanceMonitor")
-        self.operation_times = {}
+        self.min_log_duration = min_log_duration
+        self.sample_rate = sample_rate
+        # 未逐条记录的快速操作按操作名汇总，随性能报告输出
+        self._fast_operation_counts: Counter = Counter()
+        self._fast_operation_durations: Dict[str, float] = defaultdict(float)
+        self.operation_times: Dict[str, _Span] = {}
         self.resource_usage = {}
+        self._next_operation_id = itertools.count(1)
+        # 缓存当前进程的 psutil.Process，首次监控时创建；
+        # 复用同一对象也使 cpu_percent(interval=None) 能返回两次调用间的占用率
+        self._process = None
     
     def start_operation(self, operation: str) -> str:
         """开始监控操作"""
-        import time
-        import uuid
-        
-        operation_id = f"{operation}_{uuid.uuid4().hex[:8]}"
-        self.operation_times[operation_id] = {
-            'operation': operation,
-            'start_time': time.time(),
-            'end_time': None,
-            'duration': None
-        }
+        operation_id = f"{operation}_{next(self._next_operation_id)}"
+        self.operation_times[operation_id] = _Span(operation)
         
         return operation_id
     
     def end_operation(self, operation_id: str, **kwargs):
         """结束监控操作"""
-        import time
+        # 取出并清理已完成的操作
+        span = self.operation_times.pop(operation_id, None)
+        if span is None:
+            return
         
-        if operation_id in self.operation_times:
-            op_info = self.operation_times[operation_id]
-            op_info['end_time'] = time.time()
-            op_info['duration'] = op_info['end_time'] - op_info['start_time']
-            op_info.update(kwargs)
-            
-            # 记录性能日志
-            self.logger.info(
-                f"PERFORMANCE: {op_info['operation']} completed in {op_info['duration']:.3f}s",
-                extra=op_info
-            )
-            
-            # 清理已完成的操作
-            del self.operation_times[operation_id]
+        duration = (time.perf_counter_ns() - span.start_ns) / 1e9
+        op_info = {
+            'operation': span.operation,
+            'start_time': span.start_time,
+            'end_time': span.start_time + duration,
+            'duration': duration,
+            **kwargs
+        }
+        
+        # 快速操作只做汇总，按抽样率记录日志
+        if duration < self.min_log_duration:
+            self._fast_operation_counts[span.operation] += 1
+            self._fast_operation_durations[span.operation] += duration
+            if not self.sample_rate or random.random() >= self.sample_rate:
+                return
+        
+        # 记录性能日志
+        self.logger.info(
+            f"PERFORMANCE: {span.operation} completed in {duration:.3f}s",
+            extra=op_info
+        )
     
-    def monitor_resource_usage(self):
-        """监控资源使用情况"""
-        import psutil
-        import os
+    def monitor_resource_usage(self, detail: bool = False):
+        """
+        监控资源使用情况
         
+        Args:
+            detail: 是否统计网络连接数（需要遍历 /proc 下的连接表，开销较大）
+        """
         try:
-            process = psutil.Process(os.getpid())
+            if self._process is None:
+                import psutil
+                self._process = psutil.Process()
+            process = self._process
             
+            memory_info = process.memory_info()
             self.resource_usage = {
-                'cpu_percent': process.cpu_percent(),
-                'memory_mb': process.memory_info().rss / 1024 / 1024,
-                'memory_percent': process.memory_percent(),
-                'open_files': len(process.open_files()),
-                'connections': len(process.connections()),
+                'cpu_percent': process.cpu_percent(interval=None),
+                'memory_mb': memory_info.rss / 1024 / 1024,
+                'memory_percent': process.memory_percent(memtype='rss'),
+                'open_files': self._count_open_files(process),
                 'timestamp': datetime.now().isoformat()
             }
+            if detail:
+                self.resource_usage['connections'] = len(process.connections())
             
             self.logger.debug(
                 f"RESOURCE: CPU: {self.resource_usage['cpu_percent']:.1f}%, "
@@ -400,10 +455,26 @@ class PerformanceMonitor:
         except Exception as e:
             self.logger.warning(f"资源监控失败: {e}")
     
+    @staticmethod
+    def _count_open_files(process) -> Optional[int]:
+        """统计打开的文件描述符/句柄数，不逐个列出文件"""
+        if hasattr(process, 'num_fds'):
+            return process.num_fds()
+        if hasattr(process, 'num_handles'):
+            return process.num_handles()
+        return None
+    
     def get_performance_report(self) -> Dict[str, Any]:
         """生成性能报告"""
         return {
             'active_operations': len(self.operation_times),
             'current_resource_usage': self.resource_usage,
-            'active_operation_list': list(self.operation_times.keys())
+            'active_operation_list': list(self.operation_times.keys()),
+            'fast_operations': {
+                operation: {
+                    'count': count,
+                    'total_duration': self._fast_operation_durations[operation],
+                }
+                for operation, count in self._fast_operation_counts.items()
+            }
         }
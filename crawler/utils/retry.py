@@ -5,18 +5,42 @@
 """
 
 import asyncio
+import concurrent.futures
 import functools
 import logging
+import threading
 import time
-from typing import Callable, Any, Optional, Union, Tuple, Type
+from typing import Callable, Any, Optional, Union, Tuple, Type, List
 import random
 
 logger = logging.getLogger(__name__)
 
+# 熔断器状态；CLOSED 为 0，调用热路径上只需真值判断
+_CLOSED, _OPEN, _HALF_OPEN = 0, 1, 2
+_STATE_NAMES = ('CLOSED', 'OPEN', 'HALF_OPEN')
+
+# 低于该值（秒）的异步重试延迟视为 0
+_MIN_ASYNC_SLEEP = 0.001
+
+
+class CircuitBreakerOpenError(Exception):
+    """熔断器开启时拒绝调用抛出的异常；消息在转换为字符串时才格式化"""
+    
+    def __init__(self, func_name: str, kind: str = '函数'):
+        super().__init__(func_name, kind)
+        self.func_name = func_name
+        self.kind = kind
+    
+    def __str__(self) -> str:
+        return f"熔断器开启，{self.kind} {self.func_name} 暂时不可用"
+
 
 class RetryConfig:
     """重试配置类"""
     
+    __slots__ = ('max_attempts', 'base_delay', 'max_delay', 'exponential_base',
+                 'jitter', 'backoff_strategy', '_base_delays')
+    
     def __init__(self,
                  max_attempts: int = 3,
                  base_delay: float = 1.0,
@@ -41,6 +65,31 @@ class RetryConfig:
         self.exponential_base = exponential_base
         self.jitter = jitter
         self.backoff_strategy = backoff_strategy
+        
+        # 各次尝试的基础延迟（不含抖动）只取决于配置，预先算好；延迟不随尝试次数
+        # 减小时，达到 max_delay 后就不再计算，之后的尝试都使用 max_delay
+        self._base_delays: List[float] = []
+        non_decreasing = backoff_strategy != 'exponential' or exponential_base >= 1
+        for attempt in range(max(max_attempts, 0)):
+            delay = self._calculate_base_delay(attempt)
+            self._base_delays.append(delay)
+            if non_decreasing and delay >= max_delay:
+                break
+    
+    def _calculate_base_delay(self, attempt: int) -> float:
+        """按退避策略计算不含抖动的延迟，并限制最大延迟"""
+        if self.backoff_strategy == 'exponential':
+            try:
+                delay = self.base_delay * (self.exponential_base ** attempt)
+            except OverflowError:
+                # 尝试次数很大时指数超出浮点范围，此时必然超过最大延迟
+                delay = self.max_delay
+        elif self.backoff_strategy == 'linear':
+            delay = self.base_delay * (attempt + 1)
+        else:  # fixed
+            delay = self.base_delay
+        
+        return min(delay, self.max_delay)
     
     def calculate_delay(self, attempt: int) -> float:
         """
@@ -52,20 +101,17 @@ class RetryConfig:
         Returns:
             延迟时间（秒）
         """
-        if self.backoff_strategy == 'exponential':
-            delay = self.base_delay * (self.exponential_base ** attempt)
-        elif self.backoff_strategy == 'linear':
-            delay = self.base_delay * (attempt + 1)
-        else:  # fixed
-            delay = self.base_delay
-        
-        # 限制最大延迟
-        delay = min(delay, self.max_delay)
+        if 0 <= attempt < len(self._base_delays):
+            delay = self._base_delays[attempt]
+        elif 0 <= attempt < self.max_attempts:
+            # 预计算在达到 max_delay 时提前结束
+            delay = self.max_delay
+        else:
+            delay = self._calculate_base_delay(attempt)
         
-        # 添加随机抖动
+        # 添加随机抖动（±10%）
         if self.jitter:
-            jitter_range = delay * 0.1  # 10%的抖动
-            delay += random.uniform(-jitter_range, jitter_range)
+            delay += (random.random() * 2 - 1) * 0.1 * delay
         
         return max(0, delay)
 
@@ -91,22 +137,23 @@ def retry_on_exception(
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            # time.sleep 会阻塞事件循环，异步上下文中必须使用 async_retry_on_exception
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                raise RuntimeError(
+                    f"函数 {func.__name__} 在运行中的事件循环内使用了 retry_on_exception，"
+                    f"请改用 async_retry_on_exception"
+                )
             
-            for attempt in range(config.max_attempts):
+            # 前 max_attempts - 1 次失败后等待重试
+            for attempt in range(config.max_attempts - 1):
                 try:
                     return func(*args, **kwargs)
                     
                 except exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == config.max_attempts - 1:
-                        # 最后一次尝试失败
-                        if on_failure:
-                            on_failure(e, attempt + 1)
-                        logger.error(f"函数 {func.__name__} 在 {config.max_attempts} 次尝试后最终失败: {e}")
-                        raise e
-                    
                     # 计算延迟时间
                     delay = config.calculate_delay(attempt)
                     
@@ -114,13 +161,20 @@ def retry_on_exception(
                     if on_retry:
                         on_retry(e, attempt + 1, delay)
                     
-                    logger.warning(f"函数 {func.__name__} 第 {attempt + 1} 次尝试失败: {e}，{delay:.2f}秒后重试")
+                    logger.warning("函数 %s 第 %d 次尝试失败: %s，%.2f秒后重试", func.__name__, attempt + 1, e, delay)
                     
                     # 等待后重试
                     time.sleep(delay)
             
-            # 理论上不会到达这里
-            raise last_exception
+            # 最后一次尝试，失败直接抛出
+            try:
+                return func(*args, **kwargs)
+                
+            except exceptions as e:
+                if on_failure:
+                    on_failure(e, config.max_attempts)
+                logger.error("函数 %s 在 %d 次尝试后最终失败: %s", func.__name__, config.max_attempts, e)
+                raise
         
         return wrapper
     return decorator
@@ -144,45 +198,46 @@ def async_retry_on_exception(
     if config is None:
         config = RetryConfig()
     
+    # 回调是否为协程函数在装饰时判断一次，不在每次重试时检查
+    on_retry_is_async = asyncio.iscoroutinefunction(on_retry)
+    on_failure_is_async = asyncio.iscoroutinefunction(on_failure)
+    
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            last_exception = None
-            
-            for attempt in range(config.max_attempts):
+            # 前 max_attempts - 1 次失败后等待重试
+            for attempt in range(config.max_attempts - 1):
                 try:
                     return await func(*args, **kwargs)
                     
                 except exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == config.max_attempts - 1:
-                        # 最后一次尝试失败
-                        if on_failure:
-                            if asyncio.iscoroutinefunction(on_failure):
-                                await on_failure(e, attempt + 1)
-                            else:
-                                on_failure(e, attempt + 1)
-                        logger.error(f"异步函数 {func.__name__} 在 {config.max_attempts} 次尝试后最终失败: {e}")
-                        raise e
-                    
                     # 计算延迟时间
                     delay = config.calculate_delay(attempt)
                     
                     # 调用重试回调
                     if on_retry:
-                        if asyncio.iscoroutinefunction(on_retry):
+                        if on_retry_is_async:
                             await on_retry(e, attempt + 1, delay)
                         else:
                             on_retry(e, attempt + 1, delay)
                     
-                    logger.warning(f"异步函数 {func.__name__} 第 {attempt + 1} 次尝试失败: {e}，{delay:.2f}秒后重试")
+                    logger.warning("异步函数 %s 第 %d 次尝试失败: %s，%.2f秒后重试", func.__name__, attempt + 1, e, delay)
                     
-                    # 异步等待后重试
-                    await asyncio.sleep(delay)
+                    # 异步等待后重试；延迟可忽略时用 sleep(0) 只让出一次事件循环，不创建定时器
+                    await asyncio.sleep(delay if delay > _MIN_ASYNC_SLEEP else 0)
             
-            # 理论上不会到达这里
-            raise last_exception
+            # 最后一次尝试，失败直接抛出
+            try:
+                return await func(*args, **kwargs)
+                
+            except exceptions as e:
+                if on_failure:
+                    if on_failure_is_async:
+                        await on_failure(e, config.max_attempts)
+                    else:
+                        on_failure(e, config.max_attempts)
+                logger.error("异步函数 %s 在 %d 次尝试后最终失败: %s", func.__name__, config.max_attempts, e)
+                raise
         
         return wrapper
     return decorator
@@ -195,6 +250,10 @@ class CircuitBreaker:
     当错误率过高时暂时停止调用，避免系统雪崩
     """
     
+    # 可能按主机创建大量熔断器实例，固定字段不使用 __dict__
+    __slots__ = ('failure_threshold', 'recovery_timeout', 'expected_exception',
+                 'failure_count', 'last_failure_time', '_state', '_lock')
+    
     def __init__(self,
                  failure_threshold: int = 5,
                  recovery_timeout: float = 60.0,
@@ -213,7 +272,18 @@ class CircuitBreaker:
         
         self.failure_count = 0
         self.last_failure_time = None
-        self.state = 'CLOSED'  # CLOSED, OPEN, HALF_OPEN
+        self._state = _CLOSED
+        # 保护计数与状态转换；临界区内没有 await，异步熔断器可共用同一把锁
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """当前状态：CLOSED, OPEN, HALF_OPEN"""
+        return _STATE_NAMES[self._state]
+    
+    @state.setter
+    def state(self, value: str):
+        self._state = _STATE_NAMES.index(value)
     
     def __call__(self, func: Callable) -> Callable:
         """装饰器调用"""
@@ -224,11 +294,8 @@ class CircuitBreaker:
     
     def _call(self, func: Callable, *args, **kwargs):
         """执行函数调用"""
-        if self.state == 'OPEN':
-            if self._should_attempt_reset():
-                self.state = 'HALF_OPEN'
-            else:
-                raise Exception(f"熔断器开启，函数 {func.__name__} 暂时不可用")
+        if self._state and not self._allow_request():
+            raise CircuitBreakerOpenError(func.__name__)
         
         try:
             result = func(*args, **kwargs)
@@ -239,6 +306,19 @@ class CircuitBreaker:
             self._on_failure()
             raise e
     
+    def _allow_request(self) -> bool:
+        """判断是否放行本次调用；OPEN 到 HALF_OPEN 的转换在锁内比较并设置"""
+        if self._state != _OPEN:
+            return True
+        
+        with self._lock:
+            if self._state != _OPEN:
+                return True
+            if self._should_attempt_reset():
+                self._state = _HALF_OPEN
+                return True
+            return False
+    
     def _should_attempt_reset(self) -> bool:
         """判断是否应该尝试重置"""
         return (self.last_failure_time and 
@@ -246,22 +326,34 @@ class CircuitBreaker:
     
     def _on_success(self):
         """成功时的处理"""
-        self.failure_count = 0
-        self.state = 'CLOSED'
+        # 已经处于 CLOSED 且无失败计数时无需加锁写入
+        if not (self.failure_count or self._state):
+            return
+        with self._lock:
+            self.failure_count = 0
+            self._state = _CLOSED
     
     def _on_failure(self):
         """失败时的处理"""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
+        with self._lock:
+            self.failure_count += 1
+            self.last_failure_time = time.time()
+            
+            # 只在状态真正切换为 OPEN 时记录一次
+            opened = self.failure_count >= self.failure_threshold and self._state != _OPEN
+            if opened:
+                self._state = _OPEN
+            failure_count = self.failure_count
         
-        if self.failure_count >= self.failure_threshold:
-            self.state = 'OPEN'
-            logger.warning(f"熔断器开启，失败次数: {self.failure_count}")
+        if opened:
+            logger.warning("熔断器开启，失败次数: %d", failure_count)
 
 
 class AsyncCircuitBreaker(CircuitBreaker):
     """异步熔断器"""
     
+    __slots__ = ()
+    
     def __call__(self, func: Callable) -> Callable:
         """装饰器调用"""
         @functools.wraps(func)
@@ -271,11 +363,8 @@ class AsyncCircuitBreaker(CircuitBreaker):
     
     async def _call(self, func: Callable, *args, **kwargs):
         """执行异步函数调用"""
-        if self.state == 'OPEN':
-            if self._should_attempt_reset():
-                self.state = 'HALF_OPEN'
-            else:
-                raise Exception(f"熔断器开启，异步函数 {func.__name__} 暂时不可用")
+        if self._state and not self._allow_request():
+            raise CircuitBreakerOpenError(func.__name__, '异步函数')
         
         try:
             result = await func(*args, **kwargs)
@@ -287,32 +376,31 @@ class AsyncCircuitBreaker(CircuitBreaker):
             raise e
 
 
+@functools.lru_cache(maxsize=None)
+def _timeout_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """超时装饰器共用的线程池，首次使用时创建"""
+    return concurrent.futures.ThreadPoolExecutor(thread_name_prefix='timeout')
+
+
 def timeout(seconds: float):
     """
     超时装饰器（同步版本）
     
+    函数在共享线程池中执行，调用方最多等待 seconds 秒。不依赖 SIGALRM，
+    可在任意线程中使用并支持小数秒；超时后函数本身无法被强制终止，会在后台继续运行。
+    
     Args:
         seconds: 超时时间（秒）
     """
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError(f"函数 {func.__name__} 执行超时 ({seconds}秒)")
-            
-            # 设置信号处理器
-            old_handler = signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(int(seconds))
-            
+            future = _timeout_executor().submit(func, *args, **kwargs)
             try:
-                result = func(*args, **kwargs)
-                return result
-            finally:
-                # 恢复原来的信号处理器
-                signal.alarm(0)
-                signal.signal(signal.SIGALRM, old_handler)
+                return future.result(timeout=seconds)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise TimeoutError(f"函数 {func.__name__} 执行超时 ({seconds}秒)") from None
         
         return wrapper
     return decorator
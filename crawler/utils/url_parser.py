@@ -5,13 +5,49 @@ URL解析和处理工具
 """
 
 import re
+import hashlib
 import logging
-from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
-from typing import List, Set, Optional, Tuple
-from pathlib import Path
+from functools import lru_cache
+from urllib.parse import urljoin, urlparse, urlunparse
+from typing import Iterable, List, Set, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 动态图片URL判断：图片相关关键词或 /api/（不区分大小写）、/v1/ 风格的API版本、
+# 8位以上数字ID（常见于动态图片URL），合并为一个正则一次搜索
+_DYNAMIC_IMAGE_HINT_RE = re.compile(
+    r'(?i:image|img|photo|picture|wallpaper|avatar|cover|banner|thumbnail|thumb|crop|resize|/api/)'
+    r'|/v\d+/'
+    r'|/\d{8,}'
+)
+
+
+# clean_url 需要保留的查询参数
+_KEEP_QUERY_PARAMS = frozenset({'id', 'size', 'width', 'height', 'quality', 'format'})
+
+
+# 常见的规范 http(s) URL：协议、ASCII 主机部分、路径、查询、片段。
+# 含空白/控制字符、IPv6 方括号、路径参数（;）等需要 urlparse 特殊处理的输入走慢路径
+_FAST_URL_RE = re.compile(
+    r"(https?)://([A-Za-z0-9.\-_~%!$&'()*+,;=:@]+)"
+    r"(/[^?#;\x00-\x20\x7f]*)?"
+    r"(?:\?([^#\x00-\x20\x7f]*))?"
+    r"(?:#[^\x00-\x20\x7f]*)?"
+)
+
+
+@lru_cache(maxsize=None)
+def _head_session():
+    """Content-Type 检查共用的 requests 会话（连接池复用 TCP/TLS 连接），首次使用时创建"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 
 class URLParser:
     """
@@ -77,6 +113,10 @@ class URLParser:
         r'.*tel:.*',
     ]
     
+    # 各模式合并为一个交替正则，在类定义时编译一次，所有实例共享
+    _IMAGE_PATTERN_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in IMAGE_URL_PATTERNS), re.IGNORECASE)
+    _EXCLUDE_PATTERN_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in EXCLUDE_PATTERNS), re.IGNORECASE)
+    
     def __init__(self, base_url: str):
         """
         初始化URL解析器
@@ -86,8 +126,8 @@ class URLParser:
         """
         self.base_url = self.normalize_url(base_url)
         self.base_domain = self.extract_domain(self.base_url)
-        self.compiled_image_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.IMAGE_URL_PATTERNS]
-        self.compiled_exclude_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.EXCLUDE_PATTERNS]
+        # 协议相对URL（//host/...）沿用基础URL的协议，初始化时解析一次
+        self._base_scheme = urlparse(self.base_url).scheme
     
     @staticmethod
     def normalize_url(url: str) -> str:
@@ -110,6 +150,20 @@ class URLParser:
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
+        # 快速路径：规范输入直接拼接，省去 urlparse/urlunparse 的对象构造
+        match = _FAST_URL_RE.fullmatch(url)
+        if match:
+            scheme, netloc, path, query = match.groups()
+            netloc = netloc.lower()
+            if scheme == 'http' and netloc.endswith(':80'):
+                netloc = netloc[:-3]
+            elif scheme == 'https' and netloc.endswith(':443'):
+                netloc = netloc[:-4]
+            # 去掉端口后主机为空的异常输入交给 urlparse 处理
+            if netloc:
+                normalized = f"{scheme}://{netloc}{path or '/'}"
+                return f"{normalized}?{query}" if query else normalized
+        
         # 解析URL
         parsed = urlparse(url)
         
@@ -140,9 +194,10 @@ class URLParser:
         return normalized
     
     @staticmethod
+    @lru_cache(maxsize=16384)
     def extract_domain(url: str) -> str:
         """
-        提取域名
+        提取域名（结果缓存，同域判断会对大量候选URL反复调用）
         
         Args:
             url: URL
@@ -170,23 +225,29 @@ class URLParser:
             return ""
         
         try:
-            # 如果已经是绝对URL，直接返回标准化结果
-            if url.startswith(('http://', 'https://')):
-                return self.normalize_url(url)
-            
-            # 处理协议相对URL
-            if url.startswith('//'):
-                parsed_base = urlparse(self.base_url)
-                return self.normalize_url(f"{parsed_base.scheme}:{url}")
-            
-            # 处理相对URL
-            absolute_url = urljoin(self.base_url, url)
-            return self.normalize_url(absolute_url)
+            # 同一链接在页面间反复出现，按 (基础URL, URL) 缓存转换结果
+            return self._resolve_url(self.base_url, self._base_scheme, url)
             
         except Exception as e:
             logger.warning(f"URL转换失败: {url} -> {e}")
             return ""
     
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _resolve_url(base_url: str, base_scheme: str, url: str) -> str:
+        """基于 base_url 将 url 转换为标准化的绝对URL（结果缓存）"""
+        # 如果已经是绝对URL，直接返回标准化结果
+        if url.startswith(('http://', 'https://')):
+            return URLParser.normalize_url(url)
+        
+        # 处理协议相对URL
+        if url.startswith('//'):
+            return URLParser.normalize_url(f"{base_scheme}:{url}")
+        
+        # 处理相对URL
+        absolute_url = urljoin(base_url, url)
+        return URLParser.normalize_url(absolute_url)
+    
     def is_valid_url(self, url: str) -> bool:
         """
         验证URL是否有效
@@ -224,31 +285,58 @@ class URLParser:
         if not url:
             return False
 
+        matched = self._match_image_url(url)
+        if matched is not None:
+            return matched
+
+        # 如果启用内容类型检查，对可疑的动态URL进行HTTP HEAD请求
+        if check_content_type and self._is_potential_dynamic_image_url(url):
+            return self._check_content_type(url)
+
+        return False
+
+    @classmethod
+    def filter_image_urls(cls, urls: Iterable[str]) -> List[str]:
+        """
+        批量筛选图片URL（不做Content-Type检查），保持输入顺序
+
+        Args:
+            urls: URL序列
+
+        Returns:
+            判定为图片的URL列表
+        """
+        match = cls._match_image_url
+        return [url for url in urls if url and match(url)]
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _match_image_url(url: str) -> Optional[bool]:
+        """
+        基于URL本身判断是否为图片（结果缓存）
+
+        Returns:
+            True 为图片，False 为被排除，None 为无法仅凭URL判断
+        """
         # 检查是否在排除列表中
-        for pattern in self.compiled_exclude_patterns:
-            if pattern.match(url):
-                return False
+        if URLParser._EXCLUDE_PATTERN_RE.match(url):
+            return False
 
         # 检查文件扩展名
         parsed = urlparse(url)
         path = parsed.path.lower()
 
-        # 从路径中提取扩展名
-        if '.' in path:
-            ext = Path(path).suffix
-            if ext in self.IMAGE_EXTENSIONS:
-                return True
+        # 从路径中提取扩展名（直接切分字符串，不构造 Path 对象）
+        name = path.rstrip('/').rpartition('/')[2]
+        dot = name.rfind('.')
+        if dot > 0 and name[dot:] in URLParser.IMAGE_EXTENSIONS:
+            return True
 
         # 检查图片URL模式
-        for pattern in self.compiled_image_patterns:
-            if pattern.match(url):
-                return True
-
-        # 如果启用内容类型检查，对可疑的动态URL进行HTTP HEAD请求
-        if check_content_type and self._is_potential_dynamic_image_url(url):
-            return self._check_content_type(url)
+        if URLParser._IMAGE_PATTERN_RE.match(url):
+            return True
 
-        return False
+        return None
 
     def _is_potential_dynamic_image_url(self, url: str) -> bool:
         """
@@ -260,27 +348,8 @@ class URLParser:
         Returns:
             是否为潜在的动态图片URL
         """
-        # 检查URL中是否包含图片相关关键词
-        image_keywords = [
-            'image', 'img', 'photo', 'picture', 'wallpaper', 'avatar',
-            'cover', 'banner', 'thumbnail', 'thumb', 'crop', 'resize',
-            'getCroppingImg', 'getImage'
-        ]
-
-        url_lower = url.lower()
-        for keyword in image_keywords:
-            if keyword in url_lower:
-                return True
-
-        # 检查是否为API风格的URL
-        if '/api/' in url_lower or re.search(r'/v\d+/', url):
-            return True
-
-        # 检查是否包含数字ID（常见于动态图片URL）
-        if re.search(r'/\d{8,}', url):  # 8位以上数字
-            return True
-
-        return False
+        # 图片相关关键词、API风格路径或长数字ID
+        return _DYNAMIC_IMAGE_HINT_RE.search(url) is not None
 
     def _check_content_type(self, url: str) -> bool:
         """
@@ -293,8 +362,7 @@ class URLParser:
             是否为图片类型
         """
         try:
-            import requests
-            response = requests.head(url, timeout=5, allow_redirects=True)
+            response = _head_session().head(url, timeout=5, allow_redirects=True)
             content_type = response.headers.get('content-type', '').lower()
 
             # 检查是否为图片类型
@@ -338,16 +406,15 @@ class URLParser:
         try:
             parsed = urlparse(url)
             
-            # 需要保留的查询参数
-            keep_params = ['id', 'size', 'width', 'height', 'quality', 'format']
-            
             if parsed.query:
-                query_params = parse_qs(parsed.query)
-                filtered_params = {
-                    k: v for k, v in query_params.items() 
-                    if k.lower() in keep_params
-                }
-                new_query = urlencode(filtered_params, doseq=True)
+                # 直接按 & / = 切分保留需要的参数，不经过 parse_qs/urlencode 往返；
+                # 与 parse_qs 一致地丢弃空值参数，参数原有编码保持不变
+                kept = []
+                for part in parsed.query.split('&'):
+                    key, _, value = part.partition('=')
+                    if value and key.lower() in _KEEP_QUERY_PARAMS:
+                        kept.append(part)
+                new_query = '&'.join(kept)
             else:
                 new_query = ""
             
@@ -384,13 +451,12 @@ class URLParser:
             path = parsed.path
             
             if path and path != '/':
-                filename = Path(path).name
+                filename = path.rstrip('/').rpartition('/')[2]
                 if filename and '.' in filename:
                     return filename
             
-            # 如果无法从路径提取，使用URL的哈希值作为文件名
-            import hashlib
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+            # 如果无法从路径提取，使用URL的哈希值作为文件名（4字节 blake2b 即8位十六进制）
+            url_hash = hashlib.blake2b(url.encode(), digest_size=4).hexdigest()
             return f"image_{url_hash}.jpg"
             
         except Exception:
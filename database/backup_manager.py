@@ -9,26 +9,106 @@
 """
 
 import os
+import gzip
+import functools
 import json
+import shutil
+import sqlite3
+import tempfile
+import importlib
 import time
 import logging
 import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 from contextlib import contextmanager
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, asdict
 
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, ArgumentError
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
 
 from database.models.base import Base
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# 备份压缩算法及对应的文件后缀
+_COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'lz4': '.lz4'}
+_SUFFIX_COMPRESSIONS = {suffix: algo for algo, suffix in _COMPRESSION_SUFFIXES.items()}
+
+# 备份目录中视为备份文件的后缀（SQL转储、SQLite数据库文件及其压缩版本）
+_BACKUP_SUFFIXES = tuple(
+    f"{base}{suffix}"
+    for base in ('.sql', '.sqlite')
+    for suffix in ('', *_COMPRESSION_SUFFIXES.values())
+)
+
+# zstd/lz4 需要的可选依赖模块
+_COMPRESSION_MODULES = {'zstd': 'zstandard', 'lz4': 'lz4.frame'}
+
+# 备份压缩级别：备份以吞吐为先
+_GZIP_COMPRESSLEVEL = 1
+_ZSTD_LEVEL = 3
+
+# 备份文件流式复制（压缩、解压、pg_dump 管道）的块大小
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _enlarge_pipe(pipe) -> None:
+    """
+    尽量把管道容量提高到 _COPY_BUFFER_SIZE（仅 Linux 支持）
+
+    默认 64KiB 的管道会让 pg_dump 在本进程压缩数据时频繁阻塞；扩大后子进程可以
+    在压缩的同时继续输出，读取方每次也能取到整块数据。失败时保持默认容量。
+    """
+    set_pipe_size = getattr(fcntl, 'F_SETPIPE_SZ', None)
+    if set_pipe_size is None:
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), set_pipe_size, _COPY_BUFFER_SIZE)
+    except OSError as e:
+        logger.debug(f"调整管道容量失败: {e}")
+
+
+def _resolve_compression_algo(algo: str) -> str:
+    """检查压缩算法是否可用，未知算法或未安装对应模块时回退到 gzip"""
+    if algo not in _COMPRESSION_SUFFIXES:
+        logger.warning(f"未知的备份压缩算法: {algo}，使用 gzip")
+        return 'gzip'
+
+    module = _COMPRESSION_MODULES.get(algo)
+    if module:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logger.warning(f"未安装 {module}，备份压缩改用 gzip")
+            return 'gzip'
+    return algo
+
+
+def _open_compressed(path: Path, mode: str, algo: str, **kwargs):
+    """按压缩算法打开备份文件，mode 与内置 open 相同（如 'wb'、'wt'、'rb'）"""
+    if algo == 'zstd':
+        import zstandard
+        # threads=-1 按CPU核数并行压缩
+        cctx = zstandard.ZstdCompressor(level=_ZSTD_LEVEL, threads=-1) if 'w' in mode else None
+        return zstandard.open(path, mode, cctx=cctx, **kwargs)
+    if algo == 'lz4':
+        import lz4.frame
+        return lz4.frame.open(path, mode, **kwargs)
+
+    return gzip.open(path, mode, compresslevel=_GZIP_COMPRESSLEVEL, **kwargs)
+
 
 @dataclass
 class DatabaseConfig:
@@ -45,9 +125,29 @@ class DatabaseConfig:
     is_active: bool = True
     last_check: Optional[datetime] = None
     last_error: Optional[str] = None
+    # 连接池参数（SQLite 不使用）
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30  # 秒
+    pool_recycle: int = 3600  # 秒
+    # 数据库后端（'sqlite' 或 'postgres'），由 url 判断一次，用于选择备份/恢复处理函数
+    backend: str = field(default='postgres', init=False)
+    # SQLite 数据库文件路径，由 url 解析一次得到；内存数据库和非 SQLite 数据库为 None
+    file_path: Optional[str] = field(default=None, init=False)
+
+    def __post_init__(self):
+        if self.url.startswith('sqlite'):
+            self.backend = 'sqlite'
+            try:
+                # make_url 能正确处理绝对路径（sqlite:////abs）和驱动后缀（sqlite+pysqlite:///）
+                database = make_url(self.url).database
+            except ArgumentError:
+                database = None
+            if database and database != ':memory:':
+                self.file_path = database
 
 
-@dataclass
+@dataclass(frozen=True)
 class BackupConfig:
     """备份配置"""
     backup_dir: str = "backups"
@@ -55,11 +155,12 @@ class BackupConfig:
     backup_interval: int = 3600  # 秒
     enable_auto_backup: bool = True
     enable_compression: bool = True
+    compression_algo: str = "gzip"  # gzip, zstd, lz4；zstd/lz4 需另行安装 zstandard/lz4，未安装时回退到 gzip
     backup_format: str = "sql"  # sql, binary
     retention_days: int = 30
 
 
-@dataclass
+@dataclass(frozen=True)
 class FailoverConfig:
     """故障转移配置"""
     enable_auto_failover: bool = True
@@ -68,6 +169,7 @@ class FailoverConfig:
     retry_delay: int = 5  # 秒
     failover_timeout: int = 60  # 秒
     notification_enabled: bool = True
+    health_cache_ttl: float = 2.0  # 秒，连接测试结果的缓存时间，0 表示不缓存
 
 
 class DatabaseBackupManager:
@@ -97,17 +199,39 @@ class DatabaseBackupManager:
         self.databases = {db.name: db for db in databases}
         self.backup_config = backup_config
         self.failover_config = failover_config
+        self._compression_algo = _resolve_compression_algo(backup_config.compression_algo)
+        
+        # 按数据库后端分派的备份/恢复处理函数，新增后端时在这里注册
+        self._backup_handlers = {
+            'sqlite': self._backup_sqlite,
+            'postgres': self._backup_postgresql,
+        }
+        self._restore_handlers = {
+            'sqlite': self._restore_sqlite,
+            'postgres': self._restore_postgresql,
+        }
         
         # 当前活跃的数据库
         self.current_primary: Optional[str] = None
         self.engines: Dict[str, Engine] = {}
         self.session_makers: Dict[str, sessionmaker] = {}
         
+        # 连接测试结果缓存：数据库名 -> (探测完成时间, 是否可用)
+        self._health_cache: Dict[str, Tuple[float, bool]] = {}
+        # get_database_status 使用的状态模板（不随时间变化的字段）
+        self._status_templates: Dict[str, Dict[str, Any]] = {
+            name: self._build_status_template(name, config)
+            for name, config in self.databases.items()
+        }
+        
         # 监控和状态
         self.is_monitoring = False
         self.monitor_thread: Optional[threading.Thread] = None
         self.last_backup_time: Optional[datetime] = None
-        self.backup_thread: Optional[threading.Thread] = None
+        # 停止监控时唤醒正在等待的监控线程
+        self._monitor_stop = threading.Event()
+        # 并行探测各数据库的线程池，首次使用时创建，停止监控时关闭
+        self._probe_pool: Optional[ThreadPoolExecutor] = None
         
         # 状态锁
         self._lock = threading.Lock()
@@ -123,28 +247,37 @@ class DatabaseBackupManager:
     
     def _initialize_engines(self):
         """初始化数据库引擎"""
+        # 引擎重建后旧的连接测试结果不再有效
+        self._health_cache.clear()
         for name, config in self.databases.items():
             try:
-                if config.url.startswith('sqlite'):
+                if config.backend == 'sqlite':
+                    engine_options = {}
+                    if config.file_path is None:
+                        # 内存数据库只存在于单个连接中，所有会话共用同一个连接
+                        engine_options['poolclass'] = StaticPool
                     engine = create_engine(
                         config.url,
                         echo=False,
-                        connect_args={"check_same_thread": False, "timeout": 30}
+                        connect_args={"check_same_thread": False, "timeout": 30},
+                        **engine_options
                     )
                 else:
                     engine = create_engine(
                         config.url,
                         echo=False,
-                        pool_size=5,
-                        max_overflow=10,
+                        pool_size=config.pool_size,
+                        max_overflow=config.max_overflow,
+                        pool_timeout=config.pool_timeout,
                         pool_pre_ping=True,
-                        pool_recycle=3600
+                        pool_recycle=config.pool_recycle
                     )
                 
                 self.engines[name] = engine
                 self.session_makers[name] = sessionmaker(
                     autocommit=False,
                     autoflush=False,
+                    expire_on_commit=False,
                     bind=engine
                 )
                 
@@ -157,23 +290,102 @@ class DatabaseBackupManager:
     
     def _select_primary_database(self):
         """选择主数据库"""
-        # 按优先级排序，选择可用的数据库作为主数据库
-        available_dbs = [
-            (name, config) for name, config in self.databases.items()
-            if config.is_active and self._test_database_connection(name)
-        ]
+        # 选择优先级最高的可用数据库作为主数据库
+        primary = self._find_available_database()
         
-        if not available_dbs:
+        if primary is None:
             raise RuntimeError("没有可用的数据库")
         
-        # 按优先级排序
-        available_dbs.sort(key=lambda x: x[1].priority)
-        
-        self.current_primary = available_dbs[0][0]
+        self.current_primary = primary
         logger.info(f"选择主数据库: {self.current_primary}")
     
-    def _test_database_connection(self, db_name: str) -> bool:
-        """测试数据库连接"""
+    def _find_available_database(self, exclude: Optional[str] = None,
+                                 force: bool = False) -> Optional[str]:
+        """
+        按优先级依次测试连接，返回第一个可用的数据库
+        
+        先排序再探测，找到可用的数据库后即停止，不探测优先级更低的数据库。
+        
+        Args:
+            exclude: 需要跳过的数据库名称
+            force: 是否忽略连接测试缓存
+            
+        Returns:
+            数据库名称，没有可用的数据库时返回 None
+        """
+        candidates = sorted(
+            ((name, config) for name, config in self.databases.items()
+             if name != exclude and config.is_active),
+            key=lambda x: x[1].priority
+        )
+        
+        for name, _ in candidates:
+            if self._test_database_connection(name, force=force):
+                return name
+        return None
+    
+    def _test_database_connection(self, db_name: str, force: bool = False) -> bool:
+        """
+        测试数据库连接
+
+        health_cache_ttl 内的重复测试直接返回上次结果，避免反复执行 SELECT 1。
+
+        Args:
+            db_name: 数据库名称
+            force: 是否忽略缓存重新探测
+
+        Returns:
+            数据库是否可用
+        """
+        if not force:
+            cached = self._cached_connection_state(db_name)
+            if cached is not None:
+                return cached
+
+        is_connected = self._probe_database(db_name)
+        # 在探测完成后记录时间
+        self._health_cache[db_name] = (time.monotonic(), is_connected)
+        return is_connected
+
+    def _cached_connection_state(self, db_name: str) -> Optional[bool]:
+        """返回仍在 health_cache_ttl 内的连接测试结果，没有时返回 None"""
+        cached = self._health_cache.get(db_name)
+        if cached and time.monotonic() - cached[0] < self.failover_config.health_cache_ttl:
+            return cached[1]
+        return None
+
+    def _test_all_connections(self) -> Dict[str, bool]:
+        """
+        测试所有数据库连接
+
+        缓存过期的数据库在线程池中并行探测，耗时取决于最慢的一个而不是总和。
+
+        Returns:
+            数据库名称 -> 是否可用
+        """
+        results = {name: self._cached_connection_state(name) for name in list(self.databases)}
+        stale = [name for name, state in results.items() if state is None]
+
+        if len(stale) > 1:
+            probe = functools.partial(self._test_database_connection, force=True)
+            results.update(zip(stale, self._get_probe_pool().map(probe, stale)))
+        elif stale:
+            results[stale[0]] = self._test_database_connection(stale[0], force=True)
+
+        return results
+
+    def _get_probe_pool(self) -> ThreadPoolExecutor:
+        """获取并行探测线程池，首次使用时创建"""
+        with self._lock:
+            if self._probe_pool is None:
+                self._probe_pool = ThreadPoolExecutor(
+                    max_workers=max(len(self.databases), 1),
+                    thread_name_prefix='db-probe'
+                )
+            return self._probe_pool
+
+    def _probe_database(self, db_name: str) -> bool:
+        """执行 SELECT 1 探测数据库连接并更新状态"""
         try:
             if db_name not in self.engines:
                 return False
@@ -224,21 +436,41 @@ class DatabaseBackupManager:
     def get_database_status(self) -> Dict[str, Any]:
         """获取所有数据库状态"""
         status = {}
+        connections = self._test_all_connections()
         for name, config in self.databases.items():
-            is_connected = self._test_database_connection(name)
-            status[name] = {
-                "name": name,
-                "type": config.type,
-                "is_active": config.is_active,
-                "is_connected": is_connected,
-                "is_primary": name == self.current_primary,
-                "priority": config.priority,
-                "last_check": config.last_check.isoformat() if config.last_check else None,
-                "last_error": config.last_error,
-                "url": config.url
-            }
+            is_connected = connections.get(name, False)
+
+            # 复制不变字段的模板，只填入会变化的字段
+            template = self._status_templates.get(name)
+            if (template is None or template["url"] != config.url
+                    or template["priority"] != config.priority):
+                template = self._status_templates[name] = self._build_status_template(name, config)
+
+            entry = template.copy()
+            entry["type"] = config.type
+            entry["is_active"] = config.is_active
+            entry["is_connected"] = is_connected
+            entry["is_primary"] = name == self.current_primary
+            entry["last_check"] = config.last_check.isoformat() if config.last_check else None
+            entry["last_error"] = config.last_error
+            status[name] = entry
         return status
 
+    @staticmethod
+    def _build_status_template(name: str, config: DatabaseConfig) -> Dict[str, Any]:
+        """构建数据库状态模板：固定字段取自配置，其余字段由 get_database_status 填入（保持字段顺序）"""
+        return {
+            "name": name,
+            "type": None,
+            "is_active": None,
+            "is_connected": None,
+            "is_primary": None,
+            "priority": config.priority,
+            "last_check": None,
+            "last_error": None,
+            "url": config.url
+        }
+
     def create_backup(self, db_name: Optional[str] = None, backup_name: Optional[str] = None) -> str:
         """
         创建数据库备份
@@ -261,23 +493,38 @@ class DatabaseBackupManager:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"{db_name}_backup_{timestamp}"
 
-        backup_path = Path(self.backup_config.backup_dir) / f"{backup_name}.sql"
+        config = self.databases[db_name]
 
-        try:
-            config = self.databases[db_name]
+        # SQLite 的 binary 格式直接生成数据库文件副本，其余情况为SQL转储
+        binary = config.backend == 'sqlite' and self.backup_config.backup_format == 'binary'
+        suffix = '.sqlite' if binary else '.sql'
 
-            if config.url.startswith('sqlite'):
-                # SQLite备份
-                self._backup_sqlite(config.url, backup_path)
-            else:
-                # PostgreSQL备份
-                self._backup_postgresql(config, backup_path)
+        compress = self.backup_config.enable_compression
+        if compress:
+            suffix += _COMPRESSION_SUFFIXES[self._compression_algo]
+        backup_path = Path(self.backup_config.backup_dir) / f"{backup_name}{suffix}"
+
+        # 先写入 .part 临时文件，完成后原子重命名，中断时不会留下看似有效的不完整备份
+        temp_path = backup_path.with_name(f"{backup_path.name}.part")
+
+        # SQL转储在写出时直接压缩，避免先写原文件再读回压缩；
+        # binary 备份由备份API写出数据库文件，之后再单独压缩
+        if binary and compress:
+            dump_path = backup_path.with_name(f"{backup_name}.sqlite.part")
+        else:
+            dump_path = temp_path
+
+        try:
+            # binary 备份写出后再单独压缩，不在转储时压缩
+            self._backup_handlers[config.backend](config, dump_path,
+                                                  compress=compress and not binary)
 
             # 压缩备份文件
-            if self.backup_config.enable_compression:
-                compressed_path = self._compress_backup(backup_path)
-                backup_path.unlink()  # 删除原文件
-                backup_path = compressed_path
+            if dump_path != temp_path:
+                self._compress_backup(dump_path, temp_path)
+                dump_path.unlink()  # 删除原文件
+
+            os.replace(temp_path, backup_path)
 
             # 清理旧备份
             self._cleanup_old_backups()
@@ -289,31 +536,48 @@ class DatabaseBackupManager:
 
         except Exception as e:
             logger.error(f"创建数据库备份失败: {e}")
-            if backup_path.exists():
-                backup_path.unlink()
+            for path in (dump_path, temp_path):
+                if path.exists():
+                    path.unlink()
             raise
 
-    def _backup_sqlite(self, db_url: str, backup_path: Path):
-        """使用Python内置的sqlite3模块备份数据库，避免依赖外部命令。"""
-        import sqlite3
-        
-        # 提取SQLite文件路径
-        db_file = db_url.replace('sqlite:///', '')
+    def _backup_sqlite(self, config: DatabaseConfig, backup_path: Path, compress: bool = False):
+        """
+        使用Python内置的sqlite3模块备份数据库，避免依赖外部命令。
+
+        backup_format 为 binary 时使用 SQLite 在线备份API按页复制出数据库文件，
+        否则通过 iterdump() 生成SQL文本转储；compress 为 True 时转储直接写入压缩文件。
+        """
+        db_file = config.file_path
 
-        if not Path(db_file).exists():
+        if not db_file or not Path(db_file).exists():
             raise FileNotFoundError(f"SQLite数据库文件不存在: {db_file}")
 
         try:
             # 连接到源数据库
             source_conn = sqlite3.connect(db_file)
+            try:
+                if self.backup_config.backup_format == 'binary':
+                    # 在线备份API在C层逐页复制，不逐行格式化SQL
+                    dest_conn = sqlite3.connect(str(backup_path))
+                    try:
+                        source_conn.backup(dest_conn)
+                    finally:
+                        dest_conn.close()
+                else:
+                    # 以文本模式和UTF-8编码打开备份文件
+                    if compress:
+                        output = _open_compressed(backup_path, 'wt', self._compression_algo,
+                                                  encoding='utf-8')
+                    else:
+                        output = open(backup_path, 'w', encoding='utf-8')
+                    with output as f:
+                        # iterdump() 生成SQL转储
+                        for line in source_conn.iterdump():
+                            f.write(f'{line}\n')
+            finally:
+                source_conn.close()
             
-            # 以文本模式和UTF-8编码打开备份文件
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                # iterdump() 生成SQL转储
-                for line in source_conn.iterdump():
-                    f.write(f'{line}\n')
-            
-            source_conn.close()
             logger.info(f"通过Python sqlite3模块成功创建备份: {backup_path}")
 
         except sqlite3.Error as e:
@@ -327,8 +591,8 @@ class DatabaseBackupManager:
                 backup_path.unlink()
             raise e
 
-    def _backup_postgresql(self, config: DatabaseConfig, backup_path: Path):
-        """备份PostgreSQL数据库"""
+    def _backup_postgresql(self, config: DatabaseConfig, backup_path: Path, compress: bool = False):
+        """备份PostgreSQL数据库，compress 为 True 时 pg_dump 输出经管道直接写入压缩文件"""
         # 构建pg_dump命令
         cmd = [
             'pg_dump',
@@ -347,6 +611,22 @@ class DatabaseBackupManager:
         env = os.environ.copy()
         env['PGPASSWORD'] = config.password
 
+        if compress:
+            # stderr（--verbose 输出较多）写入临时文件，避免与 stdout 管道互相阻塞
+            with _open_compressed(backup_path, 'wb', self._compression_algo) as f, \
+                    tempfile.TemporaryFile() as stderr_file:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, env=env)
+                _enlarge_pipe(process.stdout)
+                with process.stdout:
+                    shutil.copyfileobj(process.stdout, f, _COPY_BUFFER_SIZE)
+                returncode = process.wait()
+
+                if returncode != 0:
+                    stderr_file.seek(0)
+                    stderr = stderr_file.read().decode('utf-8', errors='replace')
+                    raise RuntimeError(f"PostgreSQL备份失败: {stderr}")
+            return
+
         with open(backup_path, 'w', encoding='utf-8') as f:
             result = subprocess.run(
                 cmd,
@@ -359,48 +639,45 @@ class DatabaseBackupManager:
             if result.returncode != 0:
                 raise RuntimeError(f"PostgreSQL备份失败: {result.stderr}")
 
-    def _compress_backup(self, backup_path: Path) -> Path:
-        """压缩备份文件"""
-        import gzip
-
-        compressed_path = backup_path.with_suffix(backup_path.suffix + '.gz')
-
+    def _compress_backup(self, backup_path: Path, compressed_path: Path) -> Path:
+        """压缩备份文件到 compressed_path"""
+        # 按 1MiB 块复制，而不是逐行写入
         with open(backup_path, 'rb') as f_in:
-            with gzip.open(compressed_path, 'wb') as f_out:
-                f_out.writelines(f_in)
+            with _open_compressed(compressed_path, 'wb', self._compression_algo) as f_out:
+                shutil.copyfileobj(f_in, f_out, _COPY_BUFFER_SIZE)
 
         return compressed_path
 
     def _cleanup_old_backups(self):
         """清理旧备份文件"""
-        backup_dir = Path(self.backup_config.backup_dir)
-
-        # 获取所有备份文件
-        backup_files = []
-        for pattern in ['*.sql', '*.sql.gz']:
-            backup_files.extend(backup_dir.glob(pattern))
+        # 一次扫描获取所有备份文件；DirEntry 会缓存 stat 结果，排序和过期判断不再重复 stat
+        with os.scandir(self.backup_config.backup_dir) as it:
+            backup_files = [
+                entry for entry in it
+                if entry.name.endswith(_BACKUP_SUFFIXES) and entry.is_file()
+            ]
 
         # 按修改时间排序
-        backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+        backup_files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
 
         # 删除超过数量限制的备份
-        if len(backup_files) > self.backup_config.max_backups:
-            for file_path in backup_files[self.backup_config.max_backups:]:
-                try:
-                    file_path.unlink()
-                    logger.info(f"删除旧备份文件: {file_path}")
-                except Exception as e:
-                    logger.error(f"删除备份文件失败 {file_path}: {e}")
+        max_backups = self.backup_config.max_backups
+        for entry in backup_files[max_backups:]:
+            try:
+                os.unlink(entry.path)
+                logger.info(f"删除旧备份文件: {entry.path}")
+            except Exception as e:
+                logger.error(f"删除备份文件失败 {entry.path}: {e}")
 
-        # 删除超过保留期限的备份
-        cutoff_time = datetime.now() - timedelta(days=self.backup_config.retention_days)
-        for file_path in backup_files:
+        # 删除超过保留期限的备份（超出数量限制的已在上面处理）
+        cutoff_time = (datetime.now() - timedelta(days=self.backup_config.retention_days)).timestamp()
+        for entry in backup_files[:max_backups]:
             try:
-                if datetime.fromtimestamp(file_path.stat().st_mtime) < cutoff_time:
-                    file_path.unlink()
-                    logger.info(f"删除过期备份文件: {file_path}")
+                if entry.stat().st_mtime < cutoff_time:
+                    os.unlink(entry.path)
+                    logger.info(f"删除过期备份文件: {entry.path}")
             except Exception as e:
-                logger.error(f"删除过期备份文件失败 {file_path}: {e}")
+                logger.error(f"删除过期备份文件失败 {entry.path}: {e}")
 
     def restore_backup(self, backup_path: str, db_name: Optional[str] = None) -> bool:
         """
@@ -427,17 +704,12 @@ class DatabaseBackupManager:
             config = self.databases[db_name]
 
             # 解压备份文件（如果需要）
-            if backup_file.suffix == '.gz':
+            if backup_file.suffix in _SUFFIX_COMPRESSIONS:
                 temp_path = self._decompress_backup(backup_file)
             else:
                 temp_path = backup_file
 
-            if config.url.startswith('sqlite'):
-                # SQLite恢复
-                self._restore_sqlite(config.url, temp_path)
-            else:
-                # PostgreSQL恢复
-                self._restore_postgresql(config, temp_path)
+            self._restore_handlers[config.backend](config, temp_path)
 
             # 清理临时文件
             if temp_path != backup_file:
@@ -451,29 +723,25 @@ class DatabaseBackupManager:
             return False
 
     def _decompress_backup(self, compressed_path: Path) -> Path:
-        """解压备份文件"""
-        import gzip
-
+        """解压备份文件，按文件后缀选择压缩算法"""
+        algo = _SUFFIX_COMPRESSIONS[compressed_path.suffix]
         temp_path = compressed_path.with_suffix('')
 
-        with gzip.open(compressed_path, 'rb') as f_in:
+        with _open_compressed(compressed_path, 'rb', algo) as f_in:
             with open(temp_path, 'wb') as f_out:
-                f_out.writelines(f_in)
+                shutil.copyfileobj(f_in, f_out, _COPY_BUFFER_SIZE)
 
         return temp_path
 
-    def _restore_sqlite(self, db_url: str, backup_path: Path):
+    def _restore_sqlite(self, config: DatabaseConfig, backup_path: Path):
         """恢复SQLite数据库"""
-        db_file = db_url.replace('sqlite:///', '')
+        db_file = config.file_path
+        if not db_file:
+            raise RuntimeError(f"内存SQLite数据库不支持恢复: {config.name}")
 
         # 关闭所有数据库连接
-        db_name = None
-        for name, config in self.databases.items():
-            if config.url == db_url:
-                db_name = name
-                break
-
-        if db_name and db_name in self.engines:
+        db_name = config.name
+        if db_name in self.engines:
             try:
                 # 关闭引擎连接
                 self.engines[db_name].dispose()
@@ -486,27 +754,37 @@ class DatabaseBackupManager:
         if Path(db_file).exists():
             backup_current = Path(db_file).with_suffix(f'.bak_{int(time.time())}')
             try:
-                import shutil
-                shutil.copy2(db_file, backup_current)
-                Path(db_file).unlink()  # 删除原文件
+                # 原文件随后就被替换，直接改名即可保留它，不需要复制整个数据库文件
+                os.replace(db_file, backup_current)
             except Exception as e:
                 logger.error(f"备份当前数据库文件失败: {e}")
                 raise RuntimeError(f"无法备份当前数据库文件: {e}")
 
         try:
-            # 执行恢复
-            cmd = f'sqlite3 "{db_file}" < "{backup_path}"'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-
-            if result.returncode != 0:
-                raise RuntimeError(f"SQLite恢复失败: {result.stderr}")
+            # 直接使用 sqlite3 模块恢复，不依赖 sqlite3 命令行工具，也不启动 shell
+            dest_conn = sqlite3.connect(db_file)
+            try:
+                if backup_path.suffix == '.sqlite':
+                    # binary 格式备份：用在线备份API把备份文件复制回数据库
+                    source_conn = sqlite3.connect(str(backup_path))
+                    try:
+                        source_conn.backup(dest_conn)
+                    finally:
+                        source_conn.close()
+                else:
+                    # SQL转储：整体执行脚本
+                    with open(backup_path, 'r', encoding='utf-8') as f:
+                        dest_conn.executescript(f.read())
+            except sqlite3.Error as e:
+                raise RuntimeError(f"SQLite恢复失败: {e}") from e
+            finally:
+                dest_conn.close()
 
         except Exception as e:
             # 恢复失败，还原原文件
             if backup_current and backup_current.exists():
                 try:
-                    import shutil
-                    shutil.copy2(backup_current, db_file)
+                    os.replace(backup_current, db_file)
                 except Exception as restore_error:
                     logger.error(f"还原原数据库文件失败: {restore_error}")
             raise e
@@ -518,12 +796,9 @@ class DatabaseBackupManager:
                 except Exception as e:
                     logger.warning(f"删除临时备份文件失败: {e}")
 
-        # 重新初始化数据库引擎
-        if db_name:
-            try:
-                self._initialize_engines()
-            except Exception as e:
-                logger.error(f"重新初始化数据库引擎失败: {e}")
+        # 引擎在恢复前已经 dispose，下次使用时会重新连接到恢复后的文件，
+        # 不需要重建引擎（更不需要重建其他数据库的引擎），只需使连接测试缓存失效
+        self._health_cache.pop(db_name, None)
 
     def _restore_postgresql(self, config: DatabaseConfig, backup_path: Path):
         """恢复PostgreSQL数据库"""
@@ -574,8 +849,7 @@ class DatabaseBackupManager:
             source_config = self.databases[source_db]
             target_config = self.databases[target_db]
 
-            if (source_config.url.startswith('sqlite') and
-                target_config.url.startswith('sqlite')):
+            if source_config.backend == target_config.backend == 'sqlite':
                 return self._sync_sqlite_databases(source_config, target_config)
             else:
                 # 对于PostgreSQL，使用备份恢复方式
@@ -586,97 +860,43 @@ class DatabaseBackupManager:
             return False
 
     def _sync_sqlite_databases(self, source_config: DatabaseConfig, target_config: DatabaseConfig) -> bool:
-        """同步SQLite数据库（使用文件复制）"""
+        """同步SQLite数据库（使用SQLite在线备份API）"""
         try:
-            source_file = source_config.url.replace('sqlite:///', '')
-            target_file = target_config.url.replace('sqlite:///', '')
+            source_file = source_config.file_path
+            target_file = target_config.file_path
 
-            if not Path(source_file).exists():
+            if not target_file:
+                logger.error(f"目标数据库不是SQLite文件数据库: {target_config.name}")
+                return False
+
+            if not source_file or not Path(source_file).exists():
                 logger.error(f"源数据库文件不存在: {source_file}")
                 return False
 
             # 确保目标目录存在
             Path(target_file).parent.mkdir(parents=True, exist_ok=True)
 
-            # 关闭目标数据库连接
-            target_name = target_config.name
-            if target_name in self.engines:
-                try:
-                    self.engines[target_name].dispose()
-                    time.sleep(0.3)  # 等待连接关闭
-                except Exception as e:
-                    logger.warning(f"关闭目标数据库连接时出错: {e}")
-
-            # 备份现有目标文件（如果存在）
-            backup_target = None
-            if Path(target_file).exists():
-                backup_target = Path(target_file).with_suffix(f'.backup_{int(time.time())}')
-                try:
-                    import shutil
-                    shutil.copy2(target_file, backup_target)
-                except Exception as e:
-                    logger.warning(f"备份目标文件失败: {e}")
-
-            try:
-                # 复制文件
-                import shutil
-                shutil.copy2(source_file, target_file)
-                logger.info(f"数据库文件复制成功: {source_file} -> {target_file}")
-
-            except Exception as e:
-                # 复制失败，尝试恢复备份
-                if backup_target and backup_target.exists():
-                    try:
-                        import shutil
-                        shutil.copy2(backup_target, target_file)
-                        logger.info("已恢复目标数据库备份")
-                    except Exception as restore_error:
-                        logger.error(f"恢复目标数据库备份失败: {restore_error}")
-                raise e
-
-            # 重新初始化目标数据库引擎
+            # 在线备份API在目标库的写事务中按页复制，可以读取正在使用的源库；
+            # 失败时目标库保持原样，因此无需关闭目标引擎或预先备份目标文件，
+            # 已有连接在下次读取时即可看到同步后的数据
+            source_conn = sqlite3.connect(source_file)
             try:
-                # 重新创建引擎
-                if target_config.url.startswith('sqlite'):
-                    engine = create_engine(
-                        target_config.url,
-                        echo=False,
-                        connect_args={"check_same_thread": False, "timeout": 30}
-                    )
-                else:
-                    engine = create_engine(
-                        target_config.url,
-                        echo=False,
-                        pool_size=5,
-                        max_overflow=10,
-                        pool_pre_ping=True,
-                        pool_recycle=3600
-                    )
-
-                self.engines[target_name] = engine
-                self.session_makers[target_name] = sessionmaker(
-                    autocommit=False,
-                    autoflush=False,
-                    bind=engine
-                )
-
-                # 验证同步结果
-                if self._test_database_connection(target_name):
-                    logger.info(f"目标数据库连接验证成功: {target_name}")
-                else:
-                    logger.error(f"目标数据库连接验证失败: {target_name}")
-                    return False
-
-            except Exception as e:
-                logger.error(f"重新初始化目标数据库引擎失败: {e}")
-                return False
-
-            # 清理备份文件
-            if backup_target and backup_target.exists():
+                target_conn = sqlite3.connect(target_file, timeout=30)
                 try:
-                    backup_target.unlink()
-                except Exception as e:
-                    logger.warning(f"清理备份文件失败: {e}")
+                    source_conn.backup(target_conn, pages=4096)
+                finally:
+                    target_conn.close()
+            finally:
+                source_conn.close()
+            logger.info(f"数据库在线备份复制成功: {source_file} -> {target_file}")
+
+            # 验证同步结果
+            target_name = target_config.name
+            if self._test_database_connection(target_name, force=True):
+                logger.info(f"目标数据库连接验证成功: {target_name}")
+            else:
+                logger.error(f"目标数据库连接验证失败: {target_name}")
+                return False
 
             logger.info(f"SQLite数据库同步成功: {source_config.name} -> {target_config.name}")
             return True
@@ -725,15 +945,16 @@ class DatabaseBackupManager:
         Returns:
             是否转移成功
         """
-        with self._lock:
-            if target_db not in self.databases:
-                logger.error(f"目标数据库不存在: {target_db}")
-                return False
+        if target_db not in self.databases:
+            logger.error(f"目标数据库不存在: {target_db}")
+            return False
 
-            if not self._test_database_connection(target_db):
-                logger.error(f"目标数据库连接失败: {target_db}")
-                return False
+        # 连接测试在锁外进行，锁内只切换主数据库，避免网络往返期间阻塞其他线程
+        if not self._test_database_connection(target_db):
+            logger.error(f"目标数据库连接失败: {target_db}")
+            return False
 
+        with self._lock:
             old_primary = self.current_primary
             self.current_primary = target_db
 
@@ -742,13 +963,13 @@ class DatabaseBackupManager:
                 self.databases[old_primary].type = 'secondary'
             self.databases[target_db].type = 'primary'
 
-            logger.warning(f"故障转移完成: {old_primary} -> {target_db}")
+        logger.warning(f"故障转移完成: {old_primary} -> {target_db}")
 
-            # 发送通知
-            if self.failover_config.notification_enabled:
-                self._send_failover_notification(old_primary, target_db)
+        # 发送通知
+        if self.failover_config.notification_enabled:
+            self._send_failover_notification(old_primary, target_db)
 
-            return True
+        return True
 
     def _send_failover_notification(self, old_db: str, new_db: str):
         """发送故障转移通知"""
@@ -763,96 +984,102 @@ class DatabaseBackupManager:
             return
 
         self.is_monitoring = True
+        self._monitor_stop.clear()
 
-        # 启动健康检查线程
+        # 健康检查和自动备份由同一个监控线程按各自的间隔调度
         self.monitor_thread = threading.Thread(
             target=self._monitor_databases,
             daemon=True
         )
         self.monitor_thread.start()
 
-        # 启动自动备份线程
-        if self.backup_config.enable_auto_backup:
-            self.backup_thread = threading.Thread(
-                target=self._auto_backup,
-                daemon=True
-            )
-            self.backup_thread.start()
-
         logger.info("数据库监控已启动")
 
     def stop_monitoring(self):
         """停止监控"""
         self.is_monitoring = False
+        self._monitor_stop.set()
 
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
 
-        if self.backup_thread:
-            self.backup_thread.join(timeout=5)
+        with self._lock:
+            probe_pool, self._probe_pool = self._probe_pool, None
+        if probe_pool:
+            probe_pool.shutdown(wait=False)
 
         logger.info("数据库监控已停止")
 
     def _monitor_databases(self):
-        """监控数据库健康状态"""
+        """
+        监控线程主循环
+
+        按 health_check_interval 检查数据库健康状态，启用自动备份时按 backup_interval
+        执行备份；两项任务共用一个线程，每次等待到最近一项任务到期。
+        """
+        next_health_check = time.monotonic()
         while self.is_monitoring:
-            try:
-                # 检查当前主数据库
-                if self.current_primary and not self._test_database_connection(self.current_primary):
-                    logger.error(f"主数据库连接失败: {self.current_primary}")
+            if time.monotonic() >= next_health_check:
+                self._check_databases_health()
+                next_health_check = time.monotonic() + self.failover_config.health_check_interval
 
-                    # 尝试故障转移
-                    if self.failover_config.enable_auto_failover:
-                        self._attempt_failover()
+            wait_seconds = next_health_check - time.monotonic()
+            if self.backup_config.enable_auto_backup:
+                wait_seconds = min(wait_seconds, self._auto_backup())
 
-                # 检查所有数据库状态
-                for db_name in self.databases:
-                    self._test_database_connection(db_name)
+            self._monitor_stop.wait(max(wait_seconds, 0))
 
-                time.sleep(self.failover_config.health_check_interval)
+    def _check_databases_health(self):
+        """检查数据库健康状态，主数据库不可用时尝试故障转移"""
+        try:
+            # 检查当前主数据库
+            if self.current_primary and not self._test_database_connection(self.current_primary, force=True):
+                logger.error(f"主数据库连接失败: {self.current_primary}")
 
-            except Exception as e:
-                logger.error(f"数据库监控异常: {e}")
-                time.sleep(self.failover_config.health_check_interval)
+                # 尝试故障转移
+                if self.failover_config.enable_auto_failover:
+                    self._attempt_failover()
+
+            # 检查所有数据库状态（主数据库刚探测过，使用缓存结果）
+            self._test_all_connections()
+
+        except Exception as e:
+            logger.error(f"数据库监控异常: {e}")
 
     def _attempt_failover(self):
         """尝试自动故障转移"""
-        # 查找可用的备用数据库
-        available_dbs = [
-            (name, config) for name, config in self.databases.items()
-            if name != self.current_primary and
-               config.is_active and
-               self._test_database_connection(name)
-        ]
+        # 查找优先级最高的可用备用数据库
+        target_db = self._find_available_database(exclude=self.current_primary, force=True)
 
-        if not available_dbs:
+        if target_db is None:
             logger.critical("没有可用的备用数据库进行故障转移")
             return
 
-        # 按优先级排序
-        available_dbs.sort(key=lambda x: x[1].priority)
-
-        # 尝试转移到优先级最高的数据库
-        target_db = available_dbs[0][0]
-
         if self.failover_to_database(target_db):
             logger.info(f"自动故障转移成功: {target_db}")
         else:
             logger.error(f"自动故障转移失败: {target_db}")
 
-    def _auto_backup(self):
-        """自动备份"""
-        while self.is_monitoring:
-            try:
-                # 检查是否需要备份
-                if (self.last_backup_time is None or
-                    datetime.now() - self.last_backup_time >= timedelta(seconds=self.backup_config.backup_interval)):
+    def _auto_backup(self) -> float:
+        """
+        自动备份：距上次备份已超过 backup_interval 时备份当前主数据库
 
-                    if self.current_primary:
-                        self.create_backup(self.current_primary)
+        Returns:
+            距下次检查的秒数
+        """
+        if self.last_backup_time is not None:
+            elapsed = (datetime.now() - self.last_backup_time).total_seconds()
+            remaining = self.backup_config.backup_interval - elapsed
+            if remaining > 0:
+                return remaining
 
-                time.sleep(60)  # 每分钟检查一次
+        try:
+            if self.current_primary:
+                self.create_backup(self.current_primary)
+                return self.backup_config.backup_interval
 
-            except Exception as e:
-                logger.error(f"自动备份异常: {e}")
-                time.sleep(60)
+        except Exception as e:
+            logger.error(f"自动备份异常: {e}")
+
+        # 没有主数据库或备份失败时，一分钟后重试
+        return 60
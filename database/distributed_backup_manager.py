@@ -5,10 +5,20 @@
 支持PostgreSQL主从复制、逻辑复制等
 """
 
+import os
 import logging
+import functools
+import shutil
+import socket
 import time
 import threading
+import subprocess
+import tempfile
 import psycopg2
+from array import array
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
@@ -21,6 +31,101 @@ from sqlalchemy.engine import Engine
 
 logger = logging.getLogger(__name__)
 
+# 连接测试和复制状态结果的缓存时间（秒），状态接口被频繁轮询时不必每次都访问数据库
+_STATUS_TTL = 1.0
+
+# pg_is_in_recovery() 结果的缓存时间（秒），恢复状态只在提升主库时变化
+_RECOVERY_CACHE_TTL = 60.0
+
+# 提升从库后等待其退出恢复模式的最长时间和轮询间隔（秒）
+_PROMOTE_TIMEOUT = 2.0
+_PROMOTE_POLL_INTERVAL = 0.1
+
+# 连接探测：先用 TCP 连接判断端口是否可达，每隔 _SQL_PROBE_INTERVAL 秒才升级为 SELECT 1；
+# 探测失败的结果在 _FAILURE_CACHE_TTL 秒内直接复用，避免故障期间反复等待超时
+_TCP_PROBE_TIMEOUT = 0.5
+_SQL_PROBE_INTERVAL = 30.0
+_FAILURE_CACHE_TTL = 2.0
+
+# 后台监控刷新连接和复制状态的默认间隔（秒）
+_MONITOR_INTERVAL = 5.0
+
+# 按角色区分的默认连接池参数：主库承担业务读写，从库只用于健康检查和复制监控
+_PRIMARY_POOL_OPTIONS = {'pool_size': 20, 'max_overflow': 40, 'pool_timeout': 5}
+_SECONDARY_POOL_OPTIONS = {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 30}
+
+# 主库连接不做 pre_ping，改由 TCP keepalive 发现断开的连接，监控线程按此间隔（秒）校验空闲连接
+_POOL_VALIDATE_INTERVAL = 30.0
+_KEEPALIVE_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+# 逻辑复制使用的发布和订阅名称
+_PUBLICATION_NAME = "crawler_replication"
+_SUBSCRIPTION_NAME = "crawler_subscription"
+
+# 逻辑复制相关语句：模块级语句对象在各次调用间复用 SQLAlchemy 的编译缓存，
+# 名称以绑定参数传入，语句文本保持不变
+_PUBLICATION_EXISTS_SQL = text("SELECT 1 FROM pg_publication WHERE pubname = :name")
+_SUBSCRIPTION_EXISTS_SQL = text("SELECT 1 FROM pg_subscription WHERE subname = :name")
+_CREATE_PUBLICATION_SQL = text(f"CREATE PUBLICATION {_PUBLICATION_NAME} FOR ALL TABLES")
+# 连接串作为绑定参数传入，由驱动负责转义
+_CREATE_SUBSCRIPTION_SQL = text(
+    f"CREATE SUBSCRIPTION {_SUBSCRIPTION_NAME} "
+    f"CONNECTION :conn_str PUBLICATION {_PUBLICATION_NAME}"
+)
+
+# 健康检查语句，不经过 SQLAlchemy 编译直接交给驱动执行
+_SELECT_ONE = "SELECT 1"
+
+# 复制状态和提升相关语句，模块级语句对象在各次调用间命中编译缓存，
+# 发给 PostgreSQL 的语句文本也保持不变
+_IS_IN_RECOVERY = text("SELECT pg_is_in_recovery()")
+_PROMOTE = text("SELECT pg_promote()")
+_REPL_LAG_SQL = text("SELECT EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp()))")
+# 恢复状态和复制延迟在同一次查询中取得
+_RECOVERY_AND_LAG_SQL = text(
+    "SELECT pg_is_in_recovery(), "
+    "EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp()))"
+)
+_STAT_REPLICATION_SQL = text(
+    "SELECT application_name, host(client_addr), EXTRACT(EPOCH FROM replay_lag) "
+    "FROM pg_stat_replication"
+)
+
+# 引擎的编译语句缓存大小
+_QUERY_CACHE_SIZE = 1200
+
+# 分布式备份目录
+_BACKUP_DIR = "backups"
+
+# pg_dump 失败时在错误日志中保留的 stderr 末尾行数
+_DUMP_ERROR_TAIL_LINES = 20
+
+
+@functools.lru_cache(maxsize=None)
+def _find_executable(name: str) -> str:
+    """
+    查找 PostgreSQL 客户端工具的绝对路径，找不到时原样返回（由启动失败报告错误）
+
+    以绝对路径启动时子进程不再逐个搜索 PATH 目录。
+    """
+    return shutil.which(name) or name
+
+
+def _pgpass_field(value: Any) -> str:
+    """转义 pgpass 文件中的字段"""
+    return str(value).replace('\\', '\\\\').replace(':', '\\:')
+
+
+def _conninfo_value(value: Any) -> str:
+    """按 libpq 连接串的规则给参数值加引号，值中可以包含空格、引号和反斜杠"""
+    escaped = str(value).replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped}'"
+
 
 class ReplicationStatus(Enum):
     """复制状态"""
@@ -30,6 +135,42 @@ class ReplicationStatus(Enum):
     UNKNOWN = "unknown"
 
 
+# 复制状态在数组中按此顺序存为整数下标
+_REPLICATION_STATUSES = tuple(ReplicationStatus)
+_REPLICATION_STATUS_INDEX = {status: index for index, status in enumerate(_REPLICATION_STATUSES)}
+
+
+class _IndexedArrayView(Mapping):
+    """
+    按数据库名称读写定长数组的映射视图
+
+    各数据库的复制状态和延迟分别连续存放在数组中（按 name_to_idx 的下标），
+    对外仍保持 replication_status[name] 这样的字典用法。
+    """
+
+    __slots__ = ('_name_to_idx', '_values', '_decode', '_encode')
+
+    def __init__(self, name_to_idx: Dict[str, int], values: array,
+                 decode=None, encode=None):
+        self._name_to_idx = name_to_idx
+        self._values = values
+        self._decode = decode
+        self._encode = encode
+
+    def __getitem__(self, name: str):
+        value = self._values[self._name_to_idx[name]]
+        return value if self._decode is None else self._decode(value)
+
+    def __setitem__(self, name: str, value):
+        self._values[self._name_to_idx[name]] = value if self._encode is None else self._encode(value)
+
+    def __iter__(self):
+        return iter(self._name_to_idx)
+
+    def __len__(self) -> int:
+        return len(self._name_to_idx)
+
+
 @dataclass
 class ServerInfo:
     """服务器信息"""
@@ -65,6 +206,26 @@ class DistributedDatabaseConfig:
     last_check: Optional[datetime] = None
     last_error: Optional[str] = None
     replication_lag: float = 0.0  # 复制延迟（秒）
+    # 连接池参数，None 表示按当前角色（主库/从库）使用默认值
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_timeout: Optional[int] = None  # 秒
+    # 备份方式：logical 使用 pg_dump 逻辑备份，physical 使用 pg_basebackup 备份整个实例
+    backup_mode: str = "logical"
+    # 作为逻辑复制源时订阅使用的 libpq 连接串（含密码，不出现在 repr 中）
+    replication_conn_str: str = field(default="", init=False, repr=False)
+
+    def __post_init__(self):
+        self.replication_conn_str = " ".join(
+            f"{key}={_conninfo_value(value)}"
+            for key, value in (
+                ("host", self.host),
+                ("port", self.port),
+                ("dbname", self.database),
+                ("user", self.username),
+                ("password", self.password),
+            )
+        )
 
 
 class DistributedBackupManager:
@@ -87,22 +248,58 @@ class DistributedBackupManager:
             databases: 分布式数据库配置列表
         """
         self.databases = {db.name: db for db in databases}
+        # 按优先级排列的数据库名称，选择主库和自动故障转移时依次尝试
+        self._failover_order: List[str] = sorted(
+            self.databases, key=lambda name: self.databases[name].priority
+        )
         
         # 当前活跃的数据库
         self.current_primary: Optional[str] = None
         self.engines: Dict[str, Engine] = {}
         self.session_makers: Dict[str, sessionmaker] = {}
         
-        # 复制监控
-        self.replication_status: Dict[str, ReplicationStatus] = {}
-        self.replication_lag: Dict[str, float] = {}
+        # 复制监控：状态和延迟按数据库下标存放在定长数组中，数据库集合固定，不会随轮询增长
+        self._name_to_idx: Dict[str, int] = {name: index for index, name in enumerate(self.databases)}
+        self._status_array = array(
+            'B', [_REPLICATION_STATUS_INDEX[ReplicationStatus.UNKNOWN]] * len(self.databases)
+        )
+        self._lag_array = array('d', [0.0] * len(self.databases))
+        self.replication_status: Mapping[str, ReplicationStatus] = _IndexedArrayView(
+            self._name_to_idx, self._status_array,
+            decode=_REPLICATION_STATUSES.__getitem__,
+            encode=_REPLICATION_STATUS_INDEX.__getitem__
+        )
+        self.replication_lag: Mapping[str, float] = _IndexedArrayView(self._name_to_idx, self._lag_array)
+        
+        # get_cluster_status 使用的状态模板（不随时间变化的字段）
+        self._status_skeletons: Dict[str, Dict[str, Any]] = {
+            name: self._build_status_skeleton(name, config)
+            for name, config in self.databases.items()
+        }
+        
+        # 探测结果缓存：数据库名 -> (探测完成时间, 结果)
+        self._status_cache: Dict[str, Tuple[float, bool]] = {}
+        # 数据库名称 -> 最近一次 SELECT 1 探测成功的时间
+        self._last_sql_probe: Dict[str, float] = {}
+        self._replication_cache: Dict[str, Tuple[float, Tuple[ReplicationStatus, float]]] = {}
+        self._recovery_cache: Dict[str, Tuple[float, bool]] = {}
+        # 已完成逻辑复制设置的 (源数据库, 目标数据库)
+        self._logical_repl_setup: set = set()
         
         # 监控线程
         self.is_monitoring = False
         self.monitor_thread: Optional[threading.Thread] = None
+        # 停止监控时唤醒正在等待的监控线程
+        self._monitor_stop = threading.Event()
+        # 探测结果的有效期；监控运行时由监控线程定期刷新，有效期覆盖一个监控周期
+        self._cache_ttl = _STATUS_TTL
+        # 并行探测各数据库的线程池，首次使用时创建，停止监控时关闭
+        self._probe_pool: Optional[ThreadPoolExecutor] = None
         
-        # 状态锁
+        # 状态锁：只保护主库切换等短小的状态更新，不跨越网络操作
         self._lock = threading.Lock()
+        # 串行化故障转移（探测、提升从库），避免并发提升出两个主库；读取状态不需要此锁
+        self._failover_lock = threading.Lock()
         
         # 初始化
         self._initialize_engines()
@@ -115,18 +312,7 @@ class DistributedBackupManager:
         """初始化数据库引擎"""
         for name, config in self.databases.items():
             try:
-                engine = create_engine(
-                    config.url,
-                    echo=False,
-                    pool_size=10,
-                    max_overflow=20,
-                    pool_pre_ping=True,
-                    pool_recycle=3600,
-                    connect_args={
-                        "connect_timeout": 10,
-                        "application_name": f"crawler_{name}"
-                    }
-                )
+                engine = self._create_engine(name, config)
                 
                 self.engines[name] = engine
                 self.session_makers[name] = sessionmaker(
@@ -142,44 +328,211 @@ class DistributedBackupManager:
                 config.is_active = False
                 config.last_error = str(e)
     
+    def _create_engine(self, name: str, config: DistributedDatabaseConfig) -> Engine:
+        """按数据库当前角色创建引擎"""
+        is_primary = config.type == 'primary'
+        role_options = _PRIMARY_POOL_OPTIONS if is_primary else _SECONDARY_POOL_OPTIONS
+        pool_options = {
+            key: default if getattr(config, key) is None else getattr(config, key)
+            for key, default in role_options.items()
+        }
+        connect_args = {
+            "connect_timeout": 10,
+            "application_name": f"crawler_{name}"
+        }
+        if is_primary:
+            # 主库借出连接频繁，每次 pre_ping 都多一次往返；断线交给 keepalive 和监控线程校验
+            connect_args.update(_KEEPALIVE_ARGS)
+        return create_engine(
+            config.url,
+            echo=False,
+            # 从库借出连接很少，保留 pre_ping 的开销可以忽略
+            pool_pre_ping=not is_primary,
+            pool_recycle=3600,
+            # 后进先出，低负载时空闲连接自然超时回收，常用连接保持活跃
+            pool_use_lifo=True,
+            query_cache_size=_QUERY_CACHE_SIZE,
+            connect_args=connect_args,
+            **pool_options
+        )
+    
+    def _rebuild_engine(self, name: str):
+        """角色变化后按新角色的连接池参数重建引擎，沿用原有的 sessionmaker"""
+        old_engine = self.engines.get(name)
+        try:
+            engine = self._create_engine(name, self.databases[name])
+        except Exception as e:
+            logger.error(f"重建数据库引擎失败 {name}: {e}")
+            return
+        
+        self.engines[name] = engine
+        if name in self.session_makers:
+            self.session_makers[name].configure(bind=engine)
+        else:
+            self.session_makers[name] = sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=engine
+            )
+        
+        if old_engine is not None:
+            # 已借出的连接归还时直接关闭，不影响正在进行的会话
+            old_engine.dispose()
+    
     def _select_primary_database(self):
         """选择主数据库"""
-        # 首先尝试找到配置为primary的数据库
-        primary_candidates = [
-            (name, config) for name, config in self.databases.items()
-            if config.type == 'primary' and config.is_active and self._test_database_connection(name)
-        ]
+        # 首先按优先级尝试配置为primary的数据库，找到第一个可用的即停止
+        self.current_primary = next(
+            (name for name in self._failover_order
+             if self.databases[name].type == 'primary' and self._is_available(name)),
+            None
+        )
         
-        if primary_candidates:
-            # 按优先级排序
-            primary_candidates.sort(key=lambda x: x[1].priority)
-            self.current_primary = primary_candidates[0][0]
-        else:
+        if self.current_primary is None:
             # 如果没有可用的primary，从secondary中选择
-            available_dbs = [
-                (name, config) for name, config in self.databases.items()
-                if config.is_active and self._test_database_connection(name)
-            ]
-            
-            if available_dbs:
-                available_dbs.sort(key=lambda x: x[1].priority)
-                self.current_primary = available_dbs[0][0]
-                # 临时提升为primary
-                self.databases[self.current_primary].type = 'primary'
-            else:
+            # （上面测试过的数据库结果已缓存，不会重复探测）
+            self.current_primary = self._next_available_database()
+            if self.current_primary is None:
                 raise RuntimeError("没有可用的数据库")
+            
+            # 临时提升为primary
+            self.databases[self.current_primary].type = 'primary'
+            self._rebuild_engine(self.current_primary)
         
         logger.info(f"选择主数据库: {self.current_primary} ({self.databases[self.current_primary].server_info.location})")
     
-    def _test_database_connection(self, db_name: str) -> bool:
-        """测试数据库连接"""
+    def _is_available(self, db_name: str, force: bool = False) -> bool:
+        """数据库已启用且连接正常"""
+        return self.databases[db_name].is_active and self._test_database_connection(db_name, force=force)
+    
+    def _next_available_database(self, exclude: Optional[str] = None,
+                                 force: bool = False) -> Optional[str]:
+        """按优先级返回第一个可用的数据库，没有时返回 None"""
+        return next(
+            (name for name in self._failover_order
+             if name != exclude and self._is_available(name, force=force)),
+            None
+        )
+    
+    def _test_database_connection(self, db_name: str, force: bool = False) -> bool:
+        """
+        测试数据库连接
+
+        Args:
+            db_name: 数据库名称
+            force: 忽略缓存并执行 SELECT 1 探测（故障转移等需要确认数据库可用的场景），
+                刚探测失败的数据库仍直接返回 False
+        """
+        cached = self._status_cache.get(db_name)
+        if cached and cached[1] is False and time.monotonic() - cached[0] < _FAILURE_CACHE_TTL:
+            return False
+
+        if not force:
+            cached = self._cached_connection_state(db_name)
+            if cached is not None:
+                return cached
+
+        return self._refresh_connection_state(db_name, verify=force)
+
+    def _refresh_connection_state(self, db_name: str, verify: bool = False) -> bool:
+        """
+        探测数据库连接并写入缓存
+
+        先检查端口是否可达，不可达时不再等待数据库连接超时；可达时距上次
+        SELECT 1 成功超过 _SQL_PROBE_INTERVAL 秒（或 verify 为 True）才执行 SELECT 1。
+        """
+        config = self.databases[db_name]
+        is_connected = None
+        if config.url.startswith('postgresql'):
+            if not self._tcp_probe(config.host, config.port):
+                config.last_check = datetime.now()
+                config.last_error = f"无法连接到 {config.host}:{config.port}"
+                self._last_sql_probe.pop(db_name, None)
+                is_connected = False
+            elif not verify:
+                last_sql_probe = self._last_sql_probe.get(db_name)
+                if last_sql_probe is not None and time.monotonic() - last_sql_probe < _SQL_PROBE_INTERVAL:
+                    config.last_check = datetime.now()
+                    is_connected = True
+
+        if is_connected is None:
+            is_connected = self._probe_database(db_name)
+            if is_connected:
+                self._last_sql_probe[db_name] = time.monotonic()
+            else:
+                self._last_sql_probe.pop(db_name, None)
+
+        self._status_cache[db_name] = (time.monotonic(), is_connected)
+        return is_connected
+
+    @staticmethod
+    def _tcp_probe(host: str, port: int, timeout: float = _TCP_PROBE_TIMEOUT) -> bool:
+        """检查数据库端口能否建立 TCP 连接"""
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def _cached_connection_state(self, db_name: str) -> Optional[bool]:
+        """返回仍在有效期内的连接测试结果，没有时返回 None"""
+        cached = self._status_cache.get(db_name)
+        if cached and time.monotonic() - cached[0] < self._cache_ttl:
+            return cached[1]
+        return None
+
+    def _refresh_all_health(self, force: bool = False) -> Dict[str, bool]:
+        """
+        测试所有数据库连接
+
+        需要探测的数据库在线程池中并行探测，耗时取决于最慢的一个而不是总和。
+
+        Args:
+            force: 忽略缓存，探测所有数据库
+
+        Returns:
+            数据库名称 -> 是否可用
+        """
+        results = {
+            name: None if force else self._cached_connection_state(name)
+            for name in list(self.databases)
+        }
+        stale = [name for name, state in results.items() if state is None]
+
+        if len(stale) > 1:
+            results.update(zip(stale, self._get_probe_pool().map(self._refresh_connection_state, stale)))
+        elif stale:
+            results[stale[0]] = self._refresh_connection_state(stale[0])
+
+        return results
+
+    def _get_probe_pool(self) -> ThreadPoolExecutor:
+        """获取并行探测线程池，首次使用时创建"""
+        with self._lock:
+            if self._probe_pool is None:
+                self._probe_pool = ThreadPoolExecutor(
+                    max_workers=max(len(self.databases), 1),
+                    thread_name_prefix='db-probe'
+                )
+            return self._probe_pool
+
+    def _autocommit_connection(self, db_name: str):
+        """
+        获取自动提交模式的连接
+
+        探测和状态查询都是单条语句，自动提交模式下不会在语句前后多出
+        BEGIN/ROLLBACK 往返。
+        """
+        return self.engines[db_name].connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    def _probe_database(self, db_name: str) -> bool:
+        """执行 SELECT 1 探测数据库连接并更新状态"""
         try:
             if db_name not in self.engines:
                 return False
             
-            engine = self.engines[db_name]
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            with self._autocommit_connection(db_name) as conn:
+                conn.exec_driver_sql(_SELECT_ONE)
             
             # 更新状态
             config = self.databases[db_name]
@@ -195,6 +548,106 @@ class DistributedBackupManager:
             config.last_error = str(e)
             return False
     
+    def start_monitoring(self, interval: float = _MONITOR_INTERVAL):
+        """
+        启动后台监控
+
+        监控线程按固定间隔刷新所有数据库的连接和复制状态，期间
+        get_cluster_status 等读取方直接使用缓存结果，不再自行访问数据库。
+
+        Args:
+            interval: 刷新间隔（秒）
+        """
+        if self.is_monitoring:
+            return
+        
+        self.is_monitoring = True
+        self._monitor_stop.clear()
+        # 多留一个 _STATUS_TTL 覆盖探测本身的耗时
+        self._cache_ttl = interval + _STATUS_TTL
+        self.monitor_thread = threading.Thread(
+            target=self._monitor_loop,
+            args=(interval,),
+            name='distributed-db-monitor',
+            daemon=True
+        )
+        self.monitor_thread.start()
+        
+        logger.info("分布式数据库监控已启动")
+    
+    def stop_monitoring(self):
+        """停止后台监控"""
+        self.is_monitoring = False
+        self._monitor_stop.set()
+        
+        if self.monitor_thread:
+            self.monitor_thread.join(timeout=5)
+            self.monitor_thread = None
+        
+        with self._lock:
+            if self._probe_pool is not None:
+                self._probe_pool.shutdown(wait=False)
+                self._probe_pool = None
+        
+        self._cache_ttl = _STATUS_TTL
+        logger.info("分布式数据库监控已停止")
+    
+    def _monitor_loop(self, interval: float):
+        """监控主循环，停止监控时立即退出等待"""
+        last_validation = time.monotonic()
+        while not self._monitor_stop.is_set():
+            try:
+                self._refresh_all_health(force=True)
+                self._refresh_all_replication(force=True)
+                
+                if time.monotonic() - last_validation >= _POOL_VALIDATE_INTERVAL:
+                    last_validation = time.monotonic()
+                    if self.current_primary:
+                        self._validate_pool(self.current_primary)
+            except Exception as e:
+                logger.error(f"分布式数据库监控异常: {e}")
+            
+            self._monitor_stop.wait(interval)
+    
+    def _validate_pool(self, db_name: str) -> int:
+        """
+        校验连接池中的空闲连接，替代主库上关闭的 pool_pre_ping
+
+        同时借出当前所有空闲连接逐个执行 SELECT 1，失败的连接直接作废，
+        业务线程之后借到的都是可用连接。
+
+        Returns:
+            作废的连接数
+        """
+        engine = self.engines.get(db_name)
+        if engine is None:
+            return 0
+        
+        connections = []
+        invalidated = 0
+        try:
+            for _ in range(engine.pool.checkedin()):
+                try:
+                    connections.append(engine.connect())
+                except Exception as e:
+                    logger.warning(f"连接池校验时获取连接失败 {db_name}: {e}")
+                    break
+            
+            for conn in connections:
+                try:
+                    conn.exec_driver_sql(_SELECT_ONE)
+                except Exception:
+                    if not conn.invalidated:
+                        conn.invalidate()
+                    invalidated += 1
+        finally:
+            for conn in connections:
+                conn.close()
+        
+        if invalidated:
+            logger.warning(f"连接池校验作废了 {invalidated} 个失效连接: {db_name}")
+        return invalidated
+    
     def _setup_replication_monitoring(self):
         """设置复制监控"""
         for name, config in self.databases.items():
@@ -202,8 +655,33 @@ class DistributedBackupManager:
                 self.replication_status[name] = ReplicationStatus.UNKNOWN
                 self.replication_lag[name] = 0.0
     
-    def check_replication_status(self, db_name: str) -> Tuple[ReplicationStatus, float]:
-        """检查复制状态"""
+    def check_replication_status(self, db_name: str,
+                                 force: bool = False) -> Tuple[ReplicationStatus, float]:
+        """
+        检查复制状态
+
+        Args:
+            db_name: 数据库名称
+            force: 忽略缓存，重新查询复制延迟
+        """
+        if not force:
+            cached = self._replication_cache.get(db_name)
+            if cached and time.monotonic() - cached[0] < self._cache_ttl:
+                return cached[1]
+
+        result = self._probe_replication(db_name)
+        self._replication_cache[db_name] = (time.monotonic(), result)
+        return result
+
+    def _probe_replication(self, db_name: str,
+                           shared_with: Tuple[str, ...] = ()) -> Tuple[ReplicationStatus, float]:
+        """
+        查询从库的复制延迟并更新复制状态
+
+        Args:
+            db_name: 执行查询的从库
+            shared_with: 与 db_name 位于同一 PostgreSQL 实例的其他从库，直接使用相同结果
+        """
         try:
             if db_name not in self.engines:
                 return ReplicationStatus.UNKNOWN, 0.0
@@ -212,87 +690,183 @@ class DistributedBackupManager:
             if config.type != 'secondary' or not config.replication:
                 return ReplicationStatus.UNKNOWN, 0.0
             
-            engine = self.engines[db_name]
+            if not config.url.startswith('postgresql'):
+                return ReplicationStatus.UNKNOWN, 0.0
             
-            with engine.connect() as conn:
-                # 检查PostgreSQL复制状态
-                if config.url.startswith('postgresql'):
-                    # 检查复制延迟
-                    result = conn.execute(text("""
-                        SELECT 
-                            CASE 
-                                WHEN pg_is_in_recovery() THEN 
-                                    EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp()))
-                                ELSE 0 
-                            END as lag_seconds
-                    """))
-                    
-                    lag_seconds = result.scalar() or 0.0
-                    
-                    # 判断复制状态
-                    if lag_seconds < 10:
-                        status = ReplicationStatus.HEALTHY
-                    elif lag_seconds < 60:
-                        status = ReplicationStatus.LAGGING
+            in_recovery = self._cached_recovery_state(db_name)
+            if in_recovery is False:
+                # 不在恢复模式（没有物理复制延迟），无需查询
+                lag_seconds = 0.0
+            else:
+                with self._autocommit_connection(db_name) as conn:
+                    if in_recovery is None:
+                        row = conn.execute(_RECOVERY_AND_LAG_SQL).fetchone()
+                        in_recovery, lag_seconds = bool(row[0]), row[1]
+                        checked_at = time.monotonic()
+                        for name in (db_name, *shared_with):
+                            self._recovery_cache[name] = (checked_at, in_recovery)
+                        if not in_recovery:
+                            lag_seconds = 0.0
                     else:
-                        status = ReplicationStatus.BROKEN
-                    
-                    # 更新状态
-                    self.replication_status[db_name] = status
-                    self.replication_lag[db_name] = lag_seconds
-                    config.replication_lag = lag_seconds
-                    
-                    return status, lag_seconds
+                        lag_seconds = conn.execute(_REPL_LAG_SQL).scalar()
                 
-            return ReplicationStatus.UNKNOWN, 0.0
+                lag_seconds = lag_seconds or 0.0
+            
+            return self._store_replication_lag((db_name, *shared_with), lag_seconds)
             
         except Exception as e:
             logger.error(f"检查复制状态失败 {db_name}: {e}")
-            self.replication_status[db_name] = ReplicationStatus.BROKEN
+            broken = _REPLICATION_STATUS_INDEX[ReplicationStatus.BROKEN]
+            for name in (db_name, *shared_with):
+                self._status_array[self._name_to_idx[name]] = broken
             return ReplicationStatus.BROKEN, 0.0
+
+    def _store_replication_lag(self, names: Tuple[str, ...],
+                               lag_seconds: float) -> Tuple[ReplicationStatus, float]:
+        """按复制延迟判断复制状态并写入各从库"""
+        if lag_seconds < 10:
+            status = ReplicationStatus.HEALTHY
+        elif lag_seconds < 60:
+            status = ReplicationStatus.LAGGING
+        else:
+            status = ReplicationStatus.BROKEN
+        
+        status_index = _REPLICATION_STATUS_INDEX[status]
+        for name in names:
+            index = self._name_to_idx[name]
+            self._status_array[index] = status_index
+            self._lag_array[index] = lag_seconds
+            self.databases[name].replication_lag = lag_seconds
+        
+        return status, lag_seconds
+
+    def _cached_recovery_state(self, db_name: str) -> Optional[bool]:
+        """返回缓存的 pg_is_in_recovery() 结果，没有或已过期时返回 None"""
+        cached = self._recovery_cache.get(db_name)
+        if cached and time.monotonic() - cached[0] < _RECOVERY_CACHE_TTL:
+            return cached[1]
+        return None
+
+    def _refresh_all_replication(self, force: bool = False):
+        """
+        刷新所有缓存已过期的从库复制状态
+
+        先在主库上查询 pg_stat_replication，一次取得所有已连接从库的延迟；主库不可达
+        或未列出的从库再逐个实例查询。复制延迟是整个 PostgreSQL 实例的属性，
+        同一 (host, port) 上的多个从库只查询其中一个。
+
+        Args:
+            force: 忽略缓存，刷新所有从库
+        """
+        now = time.monotonic()
+        stale = []
+        for name, config in self.databases.items():
+            if config.type != 'secondary' or not config.replication:
+                continue
+            cached = self._replication_cache.get(name)
+            if not force and cached and now - cached[0] < self._cache_ttl:
+                continue
+            stale.append(name)
+        
+        if not stale:
+            return
+        
+        instances: Dict[Tuple[str, int], List[str]] = {}
+        for name in self._refresh_replication_from_primary(stale):
+            config = self.databases[name]
+            instances.setdefault((config.host, config.port), []).append(name)
+
+        if len(instances) > 1:
+            # 各实例之间互不依赖，并行查询
+            list(self._get_probe_pool().map(self._refresh_instance_replication, instances.values()))
+        else:
+            for names in instances.values():
+                self._refresh_instance_replication(names)
+
+    def _refresh_replication_from_primary(self, names: List[str]) -> List[str]:
+        """
+        通过主库的 pg_stat_replication 刷新从库复制状态
+
+        从库按 application_name（crawler_<名称> 或名称本身）或客户端地址
+        （server_info.ip 或 host）与复制连接对应。
+
+        Returns:
+            没有在主库上找到对应复制连接、需要单独查询的从库
+        """
+        primary = self.current_primary
+        if (primary is None or primary not in self.engines
+                or not self.databases[primary].url.startswith('postgresql')):
+            return names
+        
+        try:
+            with self._autocommit_connection(primary) as conn:
+                rows = conn.execute(_STAT_REPLICATION_SQL).fetchall()
+        except Exception as e:
+            logger.debug(f"从主库查询复制状态失败 {primary}: {e}")
+            return names
+        
+        by_application = {row[0]: row[2] for row in rows if row[0]}
+        by_address = {row[1]: row[2] for row in rows if row[1]}
+        
+        remaining = []
+        checked_at = time.monotonic()
+        for name in names:
+            config = self.databases[name]
+            for lookup, key in ((by_application, f"crawler_{name}"),
+                                (by_application, name),
+                                (by_address, config.server_info.ip),
+                                (by_address, config.host)):
+                if key in lookup:
+                    # replay_lag 为 NULL 表示从库已追上且近期没有新的WAL
+                    result = self._store_replication_lag((name,), float(lookup[key] or 0.0))
+                    self._replication_cache[name] = (checked_at, result)
+                    break
+            else:
+                remaining.append(name)
+        
+        return remaining
+
+    def _refresh_instance_replication(self, names: List[str]):
+        """查询同一实例上一组从库的复制状态并写入缓存"""
+        # 第一个可用的数据库代表整个实例执行查询
+        names.sort(key=lambda name: name not in self.engines)
+        result = self._probe_replication(names[0], shared_with=tuple(names[1:]))
+        checked_at = time.monotonic()
+        for name in names:
+            self._replication_cache[name] = (checked_at, result)
     
     def setup_logical_replication(self, source_db: str, target_db: str) -> bool:
         """设置逻辑复制"""
+        if (source_db, target_db) in self._logical_repl_setup:
+            return True
+        
         try:
             source_config = self.databases[source_db]
-            target_config = self.databases[target_db]
             
             # 在源数据库创建发布
             with self.engines[source_db].connect() as conn:
                 # 检查发布是否已存在
-                result = conn.execute(text(
-                    "SELECT 1 FROM pg_publication WHERE pubname = 'crawler_replication'"
-                ))
+                result = conn.execute(_PUBLICATION_EXISTS_SQL, {"name": _PUBLICATION_NAME})
                 
                 if not result.fetchone():
                     # 创建发布
-                    conn.execute(text(
-                        "CREATE PUBLICATION crawler_replication FOR ALL TABLES"
-                    ))
+                    conn.execute(_CREATE_PUBLICATION_SQL)
                     conn.commit()
                     logger.info(f"在 {source_db} 创建发布成功")
             
             # 在目标数据库创建订阅
             with self.engines[target_db].connect() as conn:
                 # 检查订阅是否已存在
-                result = conn.execute(text(
-                    "SELECT 1 FROM pg_subscription WHERE subname = 'crawler_subscription'"
-                ))
+                result = conn.execute(_SUBSCRIPTION_EXISTS_SQL, {"name": _SUBSCRIPTION_NAME})
                 
                 if not result.fetchone():
                     # 创建订阅
-                    conn_str = f"host={source_config.host} port={source_config.port} " \
-                              f"dbname={source_config.database} user={source_config.username} " \
-                              f"password={source_config.password}"
-                    
-                    conn.execute(text(f"""
-                        CREATE SUBSCRIPTION crawler_subscription 
-                        CONNECTION '{conn_str}' 
-                        PUBLICATION crawler_replication
-                    """))
+                    conn.execute(_CREATE_SUBSCRIPTION_SQL,
+                                 {"conn_str": source_config.replication_conn_str})
                     conn.commit()
                     logger.info(f"在 {target_db} 创建订阅成功")
             
+            self._logical_repl_setup.add((source_db, target_db))
             return True
             
         except Exception as e:
@@ -300,56 +874,140 @@ class DistributedBackupManager:
             return False
     
     def create_distributed_backup(self, backup_name: Optional[str] = None) -> Dict[str, str]:
-        """创建分布式备份"""
-        backup_results = {}
+        """
+        创建分布式备份
+
+        各数据库的备份在线程池中并行执行，总耗时取决于最慢的一个。每个备份是一个目录：
+        logical 模式为 pg_dump 目录格式（并行导出、压缩，用 pg_restore 恢复），
+        physical 模式为 pg_basebackup 生成的 zstd 压缩 tar 包。
+
+        Returns:
+            数据库名称 -> 备份目录路径（只包含成功的数据库）
+        """
+        active_databases = [
+            (db_name, config) for db_name, config in self.databases.items()
+            if config.is_active
+        ]
+        if not active_databases:
+            return {}
         
-        for db_name, config in self.databases.items():
-            if not config.is_active:
-                continue
-                
-            try:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                if backup_name:
-                    file_name = f"{backup_name}_{db_name}_{timestamp}.sql"
-                else:
-                    file_name = f"backup_{db_name}_{timestamp}.sql"
-                
-                backup_path = f"backups/{file_name}"
-                
-                # 使用pg_dump创建备份
-                import subprocess
-                cmd = [
-                    'pg_dump',
-                    '-h', config.host,
-                    '-p', str(config.port),
-                    '-U', config.username,
-                    '-d', config.database,
-                    '--no-password',
-                    '--verbose',
-                    '--clean',
-                    '--if-exists',
-                    '-f', backup_path
-                ]
-                
-                env = {'PGPASSWORD': config.password}
-                
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    env=env
-                )
-                
-                if result.returncode == 0:
-                    backup_results[db_name] = backup_path
-                    logger.info(f"数据库备份成功: {db_name} -> {backup_path}")
-                else:
-                    logger.error(f"数据库备份失败 {db_name}: {result.stderr}")
-                    
-            except Exception as e:
-                logger.error(f"创建备份失败 {db_name}: {e}")
+        os.makedirs(_BACKUP_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 同时运行的 pg_dump 平分CPU核数作为各自的并行导出进程数
+        jobs = max(1, (os.cpu_count() or 1) // len(active_databases))
+        
+        # 所有备份进程共用一个 pgpass 文件，继承当前环境变量（包括 PATH、PGSSLMODE 等）
+        pgpass_path = self._write_pgpass([config for _, config in active_databases])
+        env = {**os.environ, 'PGPASSFILE': pgpass_path}
+        try:
+            with ThreadPoolExecutor(max_workers=len(active_databases),
+                                    thread_name_prefix='pg-backup') as executor:
+                futures = {
+                    db_name: executor.submit(self._backup_database, db_name, config,
+                                             backup_name, timestamp, jobs, env)
+                    for db_name, config in active_databases
+                }
+        finally:
+            os.unlink(pgpass_path)
+        
+        return {
+            db_name: future.result()
+            for db_name, future in futures.items()
+            if future.result()
+        }
+    
+    @staticmethod
+    def _write_pgpass(configs: List[DistributedDatabaseConfig]) -> str:
+        """
+        写入备份使用的临时 pgpass 文件
+
+        Returns:
+            文件路径，由调用方在备份结束后删除
+        """
+        with tempfile.NamedTemporaryFile(mode='w', prefix='crawler_pgpass_',
+                                         delete=False) as pgpass_file:
+            # libpq 忽略其他用户可读的 pgpass 文件
+            os.chmod(pgpass_file.name, 0o600)
+            for config in configs:
+                # pg_basebackup 使用复制连接，对应 pgpass 中的 replication 数据库
+                database = 'replication' if config.backup_mode == 'physical' else config.database
+                pgpass_file.write(":".join(
+                    _pgpass_field(value)
+                    for value in (config.host, config.port, database,
+                                  config.username, config.password)
+                ) + "\n")
+        return pgpass_file.name
+    
+    @staticmethod
+    def _backup_command(config: DistributedDatabaseConfig, backup_path: str, jobs: int) -> List[str]:
+        """按备份方式构造备份命令"""
+        connection_args = [
+            '-h', config.host,
+            '-p', str(config.port),
+            '-U', config.username,
+            '--no-password',
+            '--verbose',
+        ]
         
-        return backup_results
+        if config.backup_mode == 'physical':
+            # 流式复制数据页和备份期间的WAL，不经过SQL层逐行导出
+            return [
+                _find_executable('pg_basebackup'),
+                *connection_args,
+                '-D', backup_path,
+                '-Ft',
+                '-Xs',
+                '--compress=zstd:6',
+            ]
+        
+        return [
+            _find_executable('pg_dump'),
+            *connection_args,
+            '-d', config.database,
+            '-Fd',
+            '-j', str(jobs),
+            '-Z', '6',
+            '-f', backup_path,
+        ]
+    
+    def _backup_database(self, db_name: str, config: DistributedDatabaseConfig,
+                         backup_name: Optional[str], timestamp: str, jobs: int,
+                         env: Dict[str, str]) -> Optional[str]:
+        """备份单个数据库，成功时返回备份目录路径"""
+        backup_path = os.path.join(_BACKUP_DIR, f"{backup_name or 'backup'}_{db_name}_{timestamp}")
+        
+        try:
+            cmd = self._backup_command(config, backup_path, jobs)
+            tool = os.path.basename(cmd[0])
+            
+            # 备份工具直接写入目标目录；--verbose 的输出逐行写入调试日志，
+            # 只保留末尾几行用于失败时的错误信息，不在内存中累积全部输出
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=env
+            )
+            stderr_tail = deque(maxlen=_DUMP_ERROR_TAIL_LINES)
+            for line in process.stderr:
+                line = line.rstrip()
+                logger.debug(f"{tool} {db_name}: {line}")
+                stderr_tail.append(line)
+            process.stderr.close()
+            
+            if process.wait() == 0:
+                logger.info(f"数据库备份成功: {db_name} -> {backup_path}")
+                return backup_path
+            
+            logger.error(f"数据库备份失败 {db_name}: " + "\n".join(stderr_tail))
+            
+        except Exception as e:
+            logger.error(f"创建备份失败 {db_name}: {e}")
+        
+        # 删除失败时留下的不完整备份
+        shutil.rmtree(backup_path, ignore_errors=True)
+        return None
     
     def get_cluster_status(self) -> Dict[str, Any]:
         """获取集群状态"""
@@ -361,25 +1019,21 @@ class DistributedBackupManager:
             "replication": {}
         }
         
+        # 先并行刷新连接状态，再按实例批量刷新复制状态，下面的 check_replication_status 直接命中缓存
+        connections = self._refresh_all_health()
+        self._refresh_all_replication()
+        
+        current_primary = self.current_primary
         for name, config in self.databases.items():
-            is_connected = self._test_database_connection(name)
-            
-            db_status = {
-                "name": name,
-                "type": config.type,
-                "is_active": config.is_active,
-                "is_connected": is_connected,
-                "is_primary": name == self.current_primary,
-                "priority": config.priority,
-                "server_info": {
-                    "location": config.server_info.location,
-                    "ip": config.server_info.ip,
-                    "region": config.server_info.region,
-                    "description": config.server_info.description
-                },
-                "last_check": config.last_check.isoformat() if config.last_check else None,
-                "last_error": config.last_error
-            }
+            # 复制不变字段的模板，只填入会变化的字段
+            db_status = self._status_skeletons[name].copy()
+            db_status["server_info"] = db_status["server_info"].copy()
+            db_status["type"] = config.type
+            db_status["is_active"] = config.is_active
+            db_status["is_connected"] = connections.get(name, False)
+            db_status["is_primary"] = name == current_primary
+            db_status["last_check"] = config.last_check.isoformat() if config.last_check else None
+            db_status["last_error"] = config.last_error
             
             # 添加复制信息
             if config.type == 'secondary' and config.replication:
@@ -395,19 +1049,49 @@ class DistributedBackupManager:
         
         return status
     
-    def failover_to_database(self, target_db: str, reason: str = "手动故障转移") -> bool:
-        """故障转移到指定数据库"""
-        with self._lock:
-            if target_db not in self.databases:
+    @staticmethod
+    def _build_status_skeleton(name: str, config: DistributedDatabaseConfig) -> Dict[str, Any]:
+        """构建数据库状态模板：固定字段取自配置，其余字段由 get_cluster_status 填入（保持字段顺序）"""
+        return {
+            "name": name,
+            "type": None,
+            "is_active": None,
+            "is_connected": None,
+            "is_primary": None,
+            "priority": config.priority,
+            "server_info": {
+                "location": config.server_info.location,
+                "ip": config.server_info.ip,
+                "region": config.server_info.region,
+                "description": config.server_info.description
+            },
+            "last_check": None,
+            "last_error": None
+        }
+    
+    def failover_to_database(self, target_db: Optional[str] = None,
+                             reason: str = "手动故障转移") -> bool:
+        """
+        故障转移到指定数据库
+
+        Args:
+            target_db: 目标数据库，为 None 时按优先级选择当前主库以外第一个可用的数据库
+            reason: 故障转移原因（用于日志）
+        """
+        # 探测和提升从库在状态锁外进行，期间 get_cluster_status 等读取方不会被阻塞
+        with self._failover_lock:
+            if target_db is None:
+                target_db = self._next_available_database(exclude=self.current_primary, force=True)
+                if target_db is None:
+                    logger.error("没有可用的故障转移目标数据库")
+                    return False
+            elif target_db not in self.databases:
                 logger.error(f"目标数据库不存在: {target_db}")
                 return False
-            
-            if not self._test_database_connection(target_db):
+            elif not self._test_database_connection(target_db, force=True):
                 logger.error(f"目标数据库连接失败: {target_db}")
                 return False
             
-            old_primary = self.current_primary
-            
             # 如果目标数据库是从库，需要提升为主库
             target_config = self.databases[target_db]
             if target_config.type == 'secondary':
@@ -415,12 +1099,23 @@ class DistributedBackupManager:
                     logger.error(f"提升从库为主库失败: {target_db}")
                     return False
             
-            self.current_primary = target_db
+            # 锁内只切换主库并更新数据库类型
+            with self._lock:
+                old_primary = self.current_primary
+                self.current_primary = target_db
+                if old_primary:
+                    self.databases[old_primary].type = 'secondary'
+                self.databases[target_db].type = 'primary'
             
-            # 更新数据库类型
-            if old_primary:
-                self.databases[old_primary].type = 'secondary'
-            self.databases[target_db].type = 'primary'
+            # 角色变化后重新判断恢复状态和复制状态
+            for name in (old_primary, target_db):
+                self._recovery_cache.pop(name, None)
+                self._replication_cache.pop(name, None)
+            
+            # 主库连接池放大，原主库缩小为从库规模
+            if old_primary and old_primary != target_db:
+                self._rebuild_engine(old_primary)
+            self._rebuild_engine(target_db)
             
             logger.warning(f"分布式故障转移完成: {old_primary} -> {target_db} ({reason})")
             
@@ -428,25 +1123,29 @@ class DistributedBackupManager:
     
     def _promote_secondary_to_primary(self, db_name: str) -> bool:
         """提升从库为主库"""
+        # 无论结果如何，角色都可能已经变化，旧的恢复状态和复制状态不再有效
+        self._recovery_cache.pop(db_name, None)
+        self._replication_cache.pop(db_name, None)
+        
         try:
-            config = self.databases[db_name]
-            
-            with self.engines[db_name].connect() as conn:
+            with self._autocommit_connection(db_name) as conn:
                 # 检查是否是从库
-                result = conn.execute(text("SELECT pg_is_in_recovery()"))
+                result = conn.execute(_IS_IN_RECOVERY)
                 is_in_recovery = result.scalar()
                 
                 if is_in_recovery:
                     # 提升从库为主库
-                    conn.execute(text("SELECT pg_promote()"))
+                    conn.execute(_PROMOTE)
                     logger.info(f"从库提升为主库成功: {db_name}")
                     
-                    # 等待提升完成
-                    time.sleep(2)
-                    
-                    # 验证提升结果
-                    result = conn.execute(text("SELECT pg_is_in_recovery()"))
-                    is_still_in_recovery = result.scalar()
+                    # 等待提升完成，退出恢复模式后立即返回
+                    deadline = time.monotonic() + _PROMOTE_TIMEOUT
+                    while True:
+                        result = conn.execute(_IS_IN_RECOVERY)
+                        is_still_in_recovery = result.scalar()
+                        if not is_still_in_recovery or time.monotonic() >= deadline:
+                            break
+                        time.sleep(_PROMOTE_POLL_INTERVAL)
                     
                     if not is_still_in_recovery:
                         logger.info(f"从库提升验证成功: {db_name}")
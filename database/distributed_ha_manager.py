@@ -13,6 +13,7 @@ import json
 import logging
 import threading
 import time
+from collections import deque
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta, timezone
 from enum import Enum
@@ -247,9 +248,8 @@ class DistributedHAManager:
         self.engines: Dict[str, Any] = {}
         self.session_makers: Dict[str, sessionmaker] = {}
 
-        # 同步队列
-        self.sync_queue: List[SyncOperation] = []
-        self.sync_lock = threading.Lock()
+        # 同步队列：deque 的 append/popleft 本身是线程安全的，生产者和同步线程之间不需要加锁
+        self.sync_queue: deque = deque()
 
         # 从配置文件加载同步配置
         sync_config = self.config.get('synchronization', {})
@@ -295,6 +295,7 @@ class DistributedHAManager:
                 session_maker = sessionmaker(
                     autocommit=False,
                     autoflush=False,
+                    expire_on_commit=False,
                     bind=engine
                 )
                 
@@ -571,12 +572,10 @@ class DistributedHAManager:
         """数据同步循环"""
         while self.is_monitoring:
             try:
-                operations_to_process = []
-                with self.sync_lock:
-                    if self.sync_queue:
-                        # 处理同步队列中的操作
-                        operations_to_process = self.sync_queue.copy()
-                        self.sync_queue.clear()
+                # 只取出本轮开始时已在队列中的操作，处理期间新加入的留到下一轮
+                operations_to_process = [
+                    self.sync_queue.popleft() for _ in range(len(self.sync_queue))
+                ]
 
                 for operation in operations_to_process:
                     self._process_sync_operation(operation)
@@ -1603,8 +1602,7 @@ class DistributedHAManager:
             ]
         )
 
-        with self.sync_lock:
-            self.sync_queue.append(operation)
+        self.sync_queue.append(operation)
 
         logger.debug(f"添加同步操作: {operation.operation_id}")
 
@@ -1703,12 +1701,9 @@ class DistributedHAManager:
 
     def get_sync_status(self) -> Dict[str, Any]:
         """获取同步状态"""
-        with self.sync_lock:
-            queue_size = len(self.sync_queue)
-
         return {
             "auto_sync_enabled": self.auto_sync_enabled,
-            "sync_queue_size": queue_size,
+            "sync_queue_size": len(self.sync_queue),
             "last_full_sync": self.last_full_sync,
             "full_sync_interval": self.full_sync_interval,
             "current_primary": self.current_primary,
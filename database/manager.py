@@ -77,6 +77,7 @@ class DatabaseManager:
             self.SessionLocal = sessionmaker(
                 autocommit=False,
                 autoflush=False,
+                expire_on_commit=False,
                 bind=self.engine
             )
             
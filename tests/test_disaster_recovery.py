@@ -90,6 +90,23 @@ class TestDatabaseBackupManager(unittest.TestCase):
         
         self.assertFalse(manager._test_database_connection("invalid"))
     
+    def test_database_connection_cache(self):
+        """测试连接测试结果缓存"""
+        manager = DatabaseBackupManager(
+            self.databases, self.backup_config, self.failover_config
+        )
+        
+        self.assertTrue(manager._test_database_connection("primary", force=True))
+        
+        # 缓存有效期内不再探测数据库
+        with patch.object(manager, '_probe_database', return_value=False) as probe:
+            self.assertTrue(manager._test_database_connection("primary"))
+            probe.assert_not_called()
+            
+            # force=True 时忽略缓存
+            self.assertFalse(manager._test_database_connection("primary", force=True))
+            probe.assert_called_once_with("primary")
+    
     def test_create_backup(self):
         """测试创建备份"""
         manager = DatabaseBackupManager(
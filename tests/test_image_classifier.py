@@ -80,6 +80,22 @@ class TestImageClassifier:
         result = self.classifier._classify_by_size(image_info)
         assert result['category'] is None
     
+    def test_analyze_colors(self):
+        """测试颜色分析"""
+        from PIL import Image
+        
+        colors = self.classifier._analyze_colors(Image.new('RGB', (80, 80), (30, 180, 60)))
+        assert colors['dominant_color'] == 'green'
+        assert not colors['is_grayscale']
+        
+        # 最大通道并列时不判定主导颜色
+        colors = self.classifier._analyze_colors(Image.new('RGB', (80, 80), (200, 50, 200)))
+        assert colors['dominant_color'] == 'unknown'
+        
+        colors = self.classifier._analyze_colors(Image.new('L', (80, 80), 128))
+        assert colors['is_grayscale']
+        assert colors['dominant_color'] == 'unknown'
+    
     def test_assess_quality(self):
         """测试质量评估"""
         # 测试高质量图片
@@ -141,6 +157,67 @@ class TestImageClassifier:
         assert result['quality_score'] > 0
         assert len(result['classification_method']) > 0
     
+    def test_classify_image_without_input(self):
+        """测试缺少分类字段时直接返回默认结果"""
+        result = self.classifier.classify_image({'md5_hash': 'abc123'})
+        
+        assert result == self.classifier._classify_image_uncached({})
+        assert result['primary_category'] == '未分类'
+        assert len(self.classifier._classify_cache) == 0
+    
+    def test_classify_image_cache(self):
+        """测试分类结果缓存"""
+        image_info = {
+            'filename': 'photo.jpg',
+            'width': 1920,
+            'height': 1080,
+            'format': 'JPEG'
+        }
+
+        first = self.classifier.classify_image(image_info)
+        first['tags'].append('修改')
+        second = self.classifier.classify_image(dict(image_info))
+
+        assert len(self.classifier._classify_cache) == 1
+        assert '修改' not in second['tags']
+        assert second['primary_category'] == first['primary_category']
+
+    def test_classify_images_batch(self, tmp_path):
+        """测试批量分类"""
+        from PIL import Image
+        
+        Image.new('RGB', (80, 60), (20, 40, 200)).save(tmp_path / 'blue.png')
+        Image.new('RGB', (80, 60), (90, 90, 90)).save(tmp_path / 'gray.png')
+        
+        self.classifier.enable_content_classification = True
+        images = [
+            {'filename': 'blue.png', 'local_path': str(tmp_path / 'blue.png')},
+            {'filename': 'gray.png', 'local_path': str(tmp_path / 'gray.png')},
+            {'filename': 'missing.png', 'local_path': str(tmp_path / 'missing.png')},
+        ]
+        
+        results = self.classifier.classify_images_batch(images, batch_size=2)
+        
+        assert [r['primary_category'] for r in results] == ['蓝色主题', '黑白图片', '未分类']
+        assert self.classifier.classify_image(images[0])['primary_category'] == '蓝色主题'
+
+    def test_classify_images_batch_matches_single(self, tmp_path):
+        """测试批量内容分类与逐张分类结果一致"""
+        from PIL import Image, ImageDraw
+
+        # 灰色背景上的小块浅色区域，缩小方式不同时会被误判为黑白图片
+        img = Image.new('RGB', (549, 489), (155, 155, 155))
+        ImageDraw.Draw(img).rectangle([303, 202, 311, 210], fill=(155, 168, 155))
+        img.save(tmp_path / 'patch.png')
+        image_info = {'filename': 'patch.png', 'local_path': str(tmp_path / 'patch.png')}
+
+        self.classifier.enable_content_classification = True
+        single = self.classifier.classify_image(dict(image_info))
+        self.classifier.clear_classification_cache()
+        batch = self.classifier.classify_images_batch([dict(image_info)])[0]
+
+        assert batch['categories'] == single['categories']
+
     def test_detect_duplicates(self):
         """测试重复检测"""
         images = [
@@ -156,6 +233,28 @@ class TestImageClassifier:
         assert 'abc123' in duplicates
         assert len(duplicates['abc123']) == 2  # 两个重复文件
     
+    def test_detect_near_duplicates(self, tmp_path):
+        """测试近似重复检测"""
+        from PIL import Image
+        
+        gradient = Image.linear_gradient('L').convert('RGB')
+        gradient.save(tmp_path / 'original.png')
+        gradient.resize((64, 64)).save(tmp_path / 'resized.jpg', quality=70)
+        gradient.rotate(90).save(tmp_path / 'rotated.png')
+        
+        images = [
+            {'local_path': str(tmp_path / 'original.png')},
+            {'local_path': str(tmp_path / 'resized.jpg')},
+            {'local_path': str(tmp_path / 'rotated.png')},
+            {'local_path': str(tmp_path / 'missing.png')},
+        ]
+        
+        duplicates = self.classifier.detect_near_duplicates(images)
+        
+        assert len(duplicates) == 1
+        group = next(iter(duplicates.values()))
+        assert [image['local_path'] for image in group] == [images[0]['local_path'], images[1]['local_path']]
+    
     def test_get_classification_statistics(self):
         """测试分类统计"""
         images = [
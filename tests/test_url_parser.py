@@ -78,6 +78,22 @@ class TestURLParser:
         assert self.parser.is_image_url("https://example.com/ads/banner.jpg") == False
         assert self.parser.is_image_url("https://example.com/thumb_image.jpg") == False
     
+    def test_filter_image_urls(self):
+        """测试批量筛选图片URL"""
+        urls = [
+            "https://example.com/a.jpg",
+            "https://example.com/style.css",
+            "",
+            "https://example.com/images/banner",
+            "https://example.com/about",
+            "https://example.com/ads/b.png",
+        ]
+        
+        result = self.parser.filter_image_urls(urls)
+        
+        assert result == ["https://example.com/a.jpg", "https://example.com/images/banner"]
+        assert result == [url for url in urls if self.parser.is_image_url(url)]
+    
     def test_is_same_domain(self):
         """测试同域名判断"""
         assert self.parser.is_same_domain("https://example.com/path") == True